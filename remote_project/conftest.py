@@ -0,0 +1,5 @@
+# Makes `matlab_example` importable by the tests whichever directory pytest
+# runs from: pytest puts the directory of this file on sys.path.
+
+# A manual check that needs a MATLAB installation, not a pytest module.
+collect_ignore = ["test_simulink.py"]
@@ -0,0 +1,80 @@
+"""Measure the import time of matlab_example modules in fresh interpreters.
+
+Fails if a module pulls in a heavy dependency at import time or takes longer
+than the budget, so that short-lived Ray workers keep starting fast.
+
+    python import_benchmark.py [--repeat 5] [--budget-ms 300]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "matlab_example.core",
+    "matlab_example.simulator",
+    "matlab_example.matlab_engine",
+    "matlab_example.evaluation",
+    "matlab_example.executor",
+]
+
+# Dependencies that must only be loaded on first use.
+HEAVY = ["pandas", "matlab", "matlab.engine", "ray", "scipy"]
+
+_PROBE = "import sys, json, {module}; print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+
+
+def measure(module: str) -> tuple:
+    """Import a module in a new interpreter.
+
+    Returns:
+        The cumulative import time in milliseconds and the loaded heavy dependencies.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative_us = int(fields[1])
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return (cumulative_us or 0) / 1000, loaded
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        try:
+            runs = [measure(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            failed = True
+            print(f"{module:<32} {'-':>8}     FAIL: {e}")
+            continue
+        median_ms = statistics.median(ms for ms, _ in runs)
+        loaded = runs[-1][1]
+        status = "ok"
+        if loaded:
+            status = f"FAIL: loaded {', '.join(loaded)}"
+        elif median_ms > args.budget_ms:
+            status = f"FAIL: above {args.budget_ms:.0f} ms"
+        failed |= status != "ok"
+        print(f"{module:<32} {median_ms:8.1f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .core import Valuation
+from .simulator import Trace
+
+logger = logging.getLogger(__name__)
+
+_META_FILE = "meta.json"
+_INDEX_FILE = "index.jsonl"
+_TIME_KEY = "__time__"
+
+
+class TraceArchive:
+    """A chunked on-disk archive of simulation traces.
+
+    Traces are buffered and written in chunks of `chunk_size` traces.
+    Within a chunk, the time steps and each output variable of all traces are
+    concatenated into one array, and the position of each trace is recorded
+    in an append-only index keyed by the digest of its valuation.
+
+    Layout of the archive directory::
+
+        meta.json           variables and chunk format
+        index.jsonl         one record per trace
+        chunk_000000.npz    compressed chunk (compress=True)
+        chunk_000000/       uncompressed chunk, one .npy per variable (compress=False)
+
+    Compressed chunks are smaller, and a read decompresses only the requested
+    variables. Uncompressed chunks are memory-mapped, so a read of a time
+    window touches only the pages of that window.
+
+    An archive must have a single writer. Use `TraceArchiveWriter` in a Ray
+    actor to append from several workers.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, os.PathLike],
+        variables: Optional[Sequence[str]] = None,
+        *,
+        chunk_size: int = 64,
+        compress: bool = True,
+    ) -> None:
+        """Open an archive, creating it if it does not exist.
+
+        Args:
+            root: The directory of the archive.
+            variables: The names of the output variables. Required to create
+                a new archive; must match the stored ones when reopening.
+            chunk_size: The number of traces per chunk.
+            compress: Whether new chunks are compressed.
+                Ignored when reopening an existing archive.
+        """
+        assert chunk_size > 0
+        self._root = os.fspath(root)
+        self._chunk_size = chunk_size
+        meta_path = os.path.join(self._root, _META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if variables is not None and list(variables) != meta["variables"]:
+                raise ValueError(
+                    f"Variables {list(variables)} do not match the archive "
+                    f"variables {meta['variables']}."
+                )
+            self._variables: List[str] = meta["variables"]
+            self._compress: bool = meta["compress"]
+        else:
+            if variables is None:
+                raise ValueError(f"Archive {self._root} does not exist and no variables are given.")
+            os.makedirs(self._root, exist_ok=True)
+            self._variables = list(variables)
+            self._compress = compress
+            with open(meta_path, "w") as f:
+                json.dump({"variables": self._variables, "compress": self._compress}, f)
+
+        self._records: Dict[str, dict] = {}
+        self._index_pos = 0
+        self._next_chunk = 0
+        self._buffer: List[Tuple[Valuation, Trace]] = []
+        self.refresh()
+
+    @property
+    def root(self) -> str:
+        return self._root
+
+    @property
+    def variables(self) -> List[str]:
+        return self._variables
+
+    def refresh(self) -> None:
+        """Read index records appended since the last refresh.
+        Readers call this to see chunks written by the writer."""
+        index_path = os.path.join(self._root, _INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "r") as f:
+            f.seek(self._index_pos)
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    break  # Partially written record
+                record = json.loads(line)
+                self._records[record["key"]] = record
+                self._next_chunk = max(self._next_chunk, record["chunk"] + 1)
+                self._index_pos = f.tell()
+
+    def keys(self) -> List[str]:
+        return list(self._records.keys())
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, key: Union[str, Valuation]) -> bool:
+        return _key(key) in self._records
+
+    def parameters(self, key: Union[str, Valuation]) -> Dict[str, float]:
+        """Get the parameter values a trace was simulated with.
+
+        Args:
+            key: A valuation or its digest.
+
+        Returns:
+            A mapping from parameter names to values.
+        """
+        record = self._record(key)
+        return dict(zip(record["names"], record["values"]))
+
+    def select(self, **conditions: Union[float, Tuple[float, float]]) -> List[str]:
+        """Find traces by parameter values.
+
+        Args:
+            conditions: Parameter names mapped to either a value or
+                an inclusive `(lb, ub)` range.
+
+        Returns:
+            The keys of the matching traces.
+        """
+        keys = []
+        for key, record in self._records.items():
+            values = dict(zip(record["names"], record["values"]))
+            if all(_matches(values.get(name), cond) for name, cond in conditions.items()):
+                keys.append(key)
+        return keys
+
+    def append(self, valuation: Valuation, trace: Trace) -> None:
+        """Add a trace to the archive.
+        The trace is written when its chunk is full or on `flush()`.
+
+        Args:
+            valuation: The valuation the trace was simulated with.
+            trace: The simulation result.
+        """
+        if list(trace.variables) != self._variables:
+            raise ValueError(
+                f"Trace variables {trace.variables} do not match the archive "
+                f"variables {self._variables}."
+            )
+        self._buffer.append((valuation, trace))
+        if len(self._buffer) >= self._chunk_size:
+            self.flush()
+
+    def extend(self, items: Iterable[Tuple[Valuation, Trace]]) -> None:
+        for valuation, trace in items:
+            self.append(valuation, trace)
+
+    def flush(self) -> None:
+        """Write buffered traces as a new chunk."""
+        if not self._buffer:
+            return
+        chunk = self._next_chunk
+        lengths = [len(trace.time_steps) for _, trace in self._buffer]
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        arrays = {_TIME_KEY: np.concatenate([t.time_steps for _, t in self._buffer])}
+        for var in self._variables:
+            arrays[var] = np.concatenate([np.asarray(t[var]) for _, t in self._buffer])
+        self._write_chunk(chunk, arrays)
+
+        records = [
+            {
+                "key": valuation.digest(),
+                "chunk": chunk,
+                "offset": int(offset),
+                "length": int(length),
+                "names": valuation.names,
+                "values": [float(v) for v in valuation.values],
+            }
+            for (valuation, _), offset, length in zip(self._buffer, offsets, lengths)
+        ]
+        # The index is written after the chunk, so readers never see a record
+        # pointing to missing data.
+        with open(os.path.join(self._root, _INDEX_FILE), "a") as f:
+            if f.tell() > self._index_pos:
+                # Drop a record left partially written by a crash.
+                f.truncate(self._index_pos)
+            f.write("".join(json.dumps(r) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+        logger.debug(f"Wrote chunk {chunk} with {len(records)} traces.")
+        self._buffer = []
+        self.refresh()
+
+    def load(
+        self,
+        key: Union[str, Valuation],
+        variables: Optional[Sequence[str]] = None,
+        time_window: Optional[Tuple[float, float]] = None,
+    ) -> Trace:
+        """Load a trace, or a part of it.
+
+        Args:
+            key: A valuation or its digest.
+            variables: The variables to load. If `None`, all variables are loaded.
+            time_window: An inclusive `(start, end)` range of time to load.
+                If `None`, the whole trace is loaded.
+
+        Returns:
+            The (partial) trace.
+        """
+        record = self._record(key)
+        variables = self._variables if variables is None else list(variables)
+        for var in variables:
+            if var not in self._variables:
+                raise ValueError(f"Variable {var} not found in archive.")
+
+        with self._open_chunk(record["chunk"]) as chunk:
+            start = record["offset"]
+            stop = start + record["length"]
+            time_steps = chunk[_TIME_KEY][start:stop]
+            if time_window is not None:
+                lo, hi = np.searchsorted(time_steps, time_window[0], side="left"), np.searchsorted(
+                    time_steps, time_window[1], side="right"
+                )
+                time_steps = time_steps[lo:hi]
+                start, stop = start + lo, start + hi
+            return Trace(
+                time_steps=np.array(time_steps),
+                values=[np.array(chunk[var][start:stop]) for var in variables],
+                variables=variables,
+            )
+
+    def _record(self, key: Union[str, Valuation]) -> dict:
+        try:
+            return self._records[_key(key)]
+        except KeyError:
+            raise KeyError(f"Trace {_key(key)} not found in archive.") from None
+
+    def _chunk_path(self, chunk: int) -> str:
+        name = f"chunk_{chunk:06d}"
+        return os.path.join(self._root, name + ".npz" if self._compress else name)
+
+    def _write_chunk(self, chunk: int, arrays: Dict[str, np.ndarray]) -> None:
+        path = self._chunk_path(chunk)
+        tmp_path = path + ".tmp"
+        if self._compress:
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+        else:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+            # A chunk left by a crash before its index records were written is stale.
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(tmp_path, path)
+
+    def _open_chunk(self, chunk: int) -> "_Chunk":
+        return _Chunk(self._chunk_path(chunk), self._compress)
+
+
+class _Chunk:
+    """Lazy accessor of the arrays in a chunk."""
+
+    def __init__(self, path: str, compressed: bool) -> None:
+        self._path = path
+        self._npz = np.load(path) if compressed else None
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if self._npz is not None:
+            return self._npz[name]
+        return np.load(os.path.join(self._path, f"{name}.npy"), mmap_mode="r")
+
+    def close(self) -> None:
+        if self._npz is not None:
+            self._npz.close()
+            self._npz = None
+
+    def __enter__(self) -> "_Chunk":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class TraceArchiveWriter:
+    """The single writer of a `TraceArchive`.
+    This class is intended to be hosted in a Ray actor (see `create_writer_actor`)
+    so that several workers can append to the same archive."""
+
+    def __init__(
+        self,
+        root: Union[str, os.PathLike],
+        variables: Sequence[str],
+        **kwargs,
+    ) -> None:
+        self._archive = TraceArchive(root, variables, **kwargs)
+
+    def append(self, valuation: Valuation, trace: Trace) -> None:
+        self._archive.append(valuation, trace)
+
+    def extend(self, items: List[Tuple[Valuation, Trace]]) -> None:
+        self._archive.extend(items)
+
+    def flush(self) -> int:
+        """Write buffered traces and return the number of archived traces."""
+        self._archive.flush()
+        return len(self._archive)
+
+
+def create_writer_actor(
+    root: Union[str, os.PathLike],
+    variables: Sequence[str],
+    *,
+    actor_options: Optional[dict] = None,
+    **kwargs,
+):
+    """Start a Ray actor that owns the writer of an archive.
+    The root must be on a file system visible to the node hosting the actor.
+
+    Args:
+        root: The directory of the archive.
+        variables: The names of the output variables.
+        actor_options: Options passed to `ray.remote(...).options()`.
+        kwargs: Keyword arguments of `TraceArchive`.
+
+    Returns:
+        A handle of the actor. Call `append.remote(valuation, trace)` on it.
+    """
+    import ray
+
+    actor_cls = ray.remote(TraceArchiveWriter)
+    return actor_cls.options(**(actor_options or {})).remote(root, variables, **kwargs)
+
+
+def _key(key: Union[str, Valuation]) -> str:
+    return key.digest() if isinstance(key, Valuation) else key
+
+
+def _matches(value: Optional[float], cond: Union[float, Tuple[float, float]]) -> bool:
+    if value is None:
+        return False
+    if isinstance(cond, tuple):
+        return cond[0] <= value <= cond[1]
+    return value == cond
+
+
+__all__ = [
+    "TraceArchive",
+    "TraceArchiveWriter",
+    "create_writer_actor",
+]
@@ -1,5 +1,7 @@
 from .search_space import SearchSpace
+from .neighbors import NeighborIndex
 from .observation import ObservationStore
+from .turbo import TurboOptimizer
 from .signal import InputSignal
 from .valuation import Valuation
 from .parameter import *
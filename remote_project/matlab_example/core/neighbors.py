@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import heapq
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _KDTree:
+    """A static KD-tree over the rows of `points`, split at the median of the
+    widest dimension. Leaves are scanned with vectorized distances."""
+
+    def __init__(self, points: np.ndarray, leaf_size: int) -> None:
+        self._points = points
+        self._leaf_size = leaf_size
+        self._order = np.arange(len(points))
+        # Per node: split dimension (-1 for leaves), split value, children and row range.
+        self._dim: List[int] = []
+        self._split: List[float] = []
+        self._children: List[Tuple[int, int]] = []
+        self._range: List[Tuple[int, int]] = []
+        if len(points):
+            self._build(0, len(points))
+
+    def _build(self, start: int, end: int) -> int:
+        node = len(self._dim)
+        self._dim.append(-1)
+        self._split.append(0.0)
+        self._children.append((-1, -1))
+        self._range.append((start, end))
+        if end - start <= self._leaf_size:
+            return node
+        idx = self._order[start:end]
+        pts = self._points[idx]
+        spread = pts.max(axis=0) - pts.min(axis=0)
+        d = int(np.argmax(spread))
+        if spread[d] == 0:
+            return node
+        mid = (end - start) // 2
+        part = np.argpartition(pts[:, d], mid)
+        self._order[start:end] = idx[part]
+        self._dim[node] = d
+        self._split[node] = float(pts[part[mid], d])
+        left = self._build(start, start + mid)
+        right = self._build(start + mid, end)
+        self._children[node] = (left, right)
+        return node
+
+    def _leaf(self, node: int, q: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self._range[node]
+        idx = self._order[start:end]
+        return idx, np.linalg.norm(self._points[idx] - q, axis=1)
+
+    def query_radius(self, q: np.ndarray, r: float) -> Tuple[np.ndarray, np.ndarray]:
+        found_idx, found_dist = [], []
+        stack = [0] if self._dim else []
+        while stack:
+            node = stack.pop()
+            d = self._dim[node]
+            if d < 0:
+                idx, dist = self._leaf(node, q)
+                mask = dist <= r
+                found_idx.append(idx[mask])
+                found_dist.append(dist[mask])
+                continue
+            diff = q[d] - self._split[node]
+            left, right = self._children[node]
+            if diff <= r:
+                stack.append(left)
+            if diff >= -r:
+                stack.append(right)
+        if not found_idx:
+            return np.zeros(0, dtype=int), np.zeros(0)
+        return np.concatenate(found_idx), np.concatenate(found_dist)
+
+    def query_knn(self, q: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        # Max-heap of (-distance, -index) of the k nearest rows so far.
+        best: List[Tuple[float, int]] = []
+        stack = [(0, 0.0)] if self._dim else []
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound > -best[0][0]:
+                continue
+            d = self._dim[node]
+            if d < 0:
+                idx, dist = self._leaf(node, q)
+                for i, r in zip(idx.tolist(), dist.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-r, -i))
+                    elif r < -best[0][0]:
+                        heapq.heapreplace(best, (-r, -i))
+                continue
+            diff = q[d] - self._split[node]
+            left, right = self._children[node]
+            near, far = (left, right) if diff <= 0 else (right, left)
+            # Visit the near child first.
+            stack.append((far, max(bound, abs(diff))))
+            stack.append((near, bound))
+        return [(-r, -i) for r, i in best]
+
+
+class NeighborIndex:
+    """A nearest-neighbour index over a growing set of points.
+
+    Points are added to a buffer that is scanned linearly, and merged into a
+    KD-tree once the buffer grows past a fraction of the tree, so that
+    registering points one batch at a time stays cheap. Row indices are the
+    insertion order.
+    """
+
+    def __init__(self, dim: int, *, leaf_size: int = 32, rebuild_ratio: float = 0.25) -> None:
+        """Initialize an empty index.
+
+        Args:
+            dim: The dimension of the points.
+            leaf_size: The maximum number of points in a leaf of the tree.
+            rebuild_ratio: The size of the buffer, relative to the tree,
+                that triggers a rebuild.
+        """
+        assert leaf_size > 0 and rebuild_ratio > 0
+        self._dim = dim
+        self._leaf_size = leaf_size
+        self._rebuild_ratio = rebuild_ratio
+        self._points = np.zeros((0, dim))
+        self._n = 0
+        self._tree = _KDTree(self._points, leaf_size)
+        self._n_tree = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def points(self) -> np.ndarray:
+        return self._points[: self._n]
+
+    def add(self, X: np.ndarray) -> None:
+        """Add points.
+
+        Args:
+            X: Points, numpy.array, shape (n_samples, dim).
+        """
+        X = np.asarray(X, dtype=float).reshape(-1, self._dim)
+        if self._n + len(X) > len(self._points):
+            capacity = max(2 * len(self._points), self._n + len(X), 64)
+            points = np.zeros((capacity, self._dim))
+            points[: self._n] = self._points[: self._n]
+            self._points = points
+        self._points[self._n : self._n + len(X)] = X
+        self._n += len(X)
+        if self._n - self._n_tree > max(self._leaf_size, self._rebuild_ratio * self._n_tree):
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        logger.debug(f"Rebuilding the neighbour index over {self._n} points.")
+        self._tree = _KDTree(self._points[: self._n].copy(), self._leaf_size)
+        self._n_tree = self._n
+
+    def _buffer(self, q: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        idx = np.arange(self._n_tree, self._n)
+        return idx, np.linalg.norm(self._points[self._n_tree : self._n] - q, axis=1)
+
+    def query_radius(self, q: np.ndarray, r: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the points within a distance of a query point.
+
+        Args:
+            q: The query point, shape (dim,).
+            r: The radius.
+
+        Returns:
+            The distances and indices of the points, nearest first.
+        """
+        q = np.asarray(q, dtype=float).ravel()
+        idx, dist = self._tree.query_radius(q, r)
+        buf_idx, buf_dist = self._buffer(q)
+        mask = buf_dist <= r
+        idx = np.concatenate([idx, buf_idx[mask]])
+        dist = np.concatenate([dist, buf_dist[mask]])
+        order = np.argsort(dist, kind="stable")
+        return dist[order], idx[order]
+
+    def query_knn(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the `k` nearest points of a query point.
+
+        Args:
+            q: The query point, shape (dim,).
+            k: The number of neighbours.
+
+        Returns:
+            The distances and indices of at most `k` points, nearest first.
+        """
+        q = np.asarray(q, dtype=float).ravel()
+        found = self._tree.query_knn(q, k)
+        buf_idx, buf_dist = self._buffer(q)
+        found.extend(zip(buf_dist.tolist(), buf_idx.tolist()))
+        found = sorted(found)[:k]
+        return (
+            np.array([r for r, _ in found], dtype=float),
+            np.array([i for _, i in found], dtype=int),
+        )
+
+    def has_neighbor(self, X: np.ndarray, r: float) -> np.ndarray:
+        """Check for each query point whether an indexed point is within `r`.
+
+        Args:
+            X: Query points, numpy.array, shape (n_samples, dim).
+            r: The radius.
+
+        Returns:
+            A boolean array of shape (n_samples,).
+        """
+        X = np.asarray(X, dtype=float).reshape(-1, self._dim)
+        return np.array([len(self.query_radius(x, r)[1]) > 0 for x in X], dtype=bool)
+
+
+def novel_mask(X: np.ndarray, r: float, index: Optional[NeighborIndex] = None) -> np.ndarray:
+    """Select points that are farther than `r` from the points of an index and
+    from each other. Earlier points win among mutual near-duplicates.
+
+    Args:
+        X: Candidate points, numpy.array, shape (n_samples, dim).
+        r: The tolerance.
+        index: Already observed points, if any.
+
+    Returns:
+        A boolean array of shape (n_samples,), True for points to keep.
+    """
+    X = np.asarray(X, dtype=float)
+    keep = np.zeros(len(X), dtype=bool)
+    if index is not None:
+        candidates = np.flatnonzero(~index.has_neighbor(X, r))
+    else:
+        candidates = np.arange(len(X))
+    kept = NeighborIndex(X.shape[1])
+    for i in candidates:
+        if len(kept.query_radius(X[i], r)[1]) == 0:
+            keep[i] = True
+            kept.add(X[i : i + 1])
+    return keep
+
+
+__all__ = [
+    "NeighborIndex",
+    "novel_mask",
+]
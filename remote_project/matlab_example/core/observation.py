@@ -1,15 +1,46 @@
+import heapq
 import numpy as np
-import pandas as pd
-from typing import List, Optional
+from typing import List, Optional, Tuple
+
+from .neighbors import NeighborIndex, novel_mask
+from .search_space import SearchSpace
 
 class ObservationStore:
-    def __init__(self, names: List[str]):
+    """A store of observed points and their objective values.
+
+    Each observation has a fidelity level: 0 for full-fidelity simulations
+    and larger values for coarser ones. `min`, `min_x`, `current_best`,
+    `top_k` and `pareto_front` only consider full-fidelity observations.
+
+    The `k_best` best observations of each objective (column of `fx`) and
+    the Pareto front over all objectives are maintained incrementally in
+    `register`, so querying them after each batch does not sort everything.
+
+    Full-fidelity points are also kept in a nearest-neighbour index, in
+    unit-cube coordinates if a search space is given, so that a proposal
+    within a tolerance of an observed point can reuse its result.
+    """
+
+    def __init__(
+        self, names: List[str], k_best: int = 16, space: Optional[SearchSpace] = None
+    ):
         self._X: List[np.ndarray] = []
         self._fX: List[np.ndarray] = []
+        self._fidelities: List[int] = []
         self._names = names
         self._current_best = np.inf
+        self._k_best = k_best
+        # Per objective, a max-heap of (-value, -index) of the best k_best rows.
+        self._heaps: List[List[Tuple[float, int]]] = []
+        self._front: np.ndarray = np.zeros(0, dtype=int)
+        self._front_fx: Optional[np.ndarray] = None
+        self._fidelities_array: Optional[np.ndarray] = None
+        self._space = space
+        self._index = NeighborIndex(len(names))
+        # Maps rows of the neighbour index to rows of the store.
+        self._index_rows: List[int] = []
 
-    def register(self, x: np.ndarray, fx: np.ndarray) -> None:
+    def register(self, x: np.ndarray, fx: np.ndarray, fidelity: int = 0) -> None:
         if not isinstance(x, np.ndarray):
             x = np.array(x)
         if not isinstance(fx, np.ndarray):
@@ -18,11 +49,127 @@ class ObservationStore:
         assert fx.ndim == 2
         assert len(x) == len(fx)
 
-        for i in range(len(x)):
-            self._X.append(x[i])
-            self._fX.append(fx[i])
-            if fx[i] < self._current_best:
-                self._current_best = fx[i]
+        start = len(self._X)
+        self._X.extend(x)
+        self._fX.extend(fx)
+        self._fidelities.extend([fidelity] * len(x))
+        self._fidelities_array = None
+        if fidelity != 0 or len(x) == 0:
+            return
+        # Element-wise, so that multi-objective rows do not need a total order.
+        self._current_best = np.minimum(self._current_best, fx.min(axis=0))
+        self._update_heaps(fx, start)
+        self._update_front(fx, start)
+        self._index.add(self._normalize(x))
+        self._index_rows.extend(range(start, start + len(x)))
+
+    def _update_heaps(self, fx: np.ndarray, start: int) -> None:
+        while len(self._heaps) < fx.shape[1]:
+            self._heaps.append([])
+        for j, heap in enumerate(self._heaps[: fx.shape[1]]):
+            column = fx[:, j]
+            if len(heap) >= self._k_best:
+                # Only rows better than the current k-th can enter the heap.
+                candidates = np.flatnonzero(column < -heap[0][0])
+            else:
+                candidates = np.arange(len(column))
+            for i in candidates:
+                entry = (-float(column[i]), -(start + int(i)))
+                if len(heap) < self._k_best:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+
+    def _update_front(self, fx: np.ndarray, start: int) -> None:
+        new_idx = np.arange(start, start + len(fx))
+        front_fx = self._front_fx if self._front_fx is not None else np.zeros((0, fx.shape[1]))
+        if fx.shape[1] == 1:
+            # A single objective: the front is the set of rows at the minimum.
+            best = fx[:, 0].min()
+            at_best = new_idx[fx[:, 0] == best]
+            if len(front_fx) == 0 or best < front_fx[0, 0]:
+                self._front = at_best
+            elif best == front_fx[0, 0]:
+                self._front = np.concatenate([self._front, at_best])
+            else:
+                return
+            self._front_fx = np.full((len(self._front), 1), best)
+            return
+        # Only the new rows that the current front does not dominate can enter it.
+        keep = ~_dominated_by(fx, front_fx)
+        new_fx, new_idx = fx[keep], new_idx[keep]
+        nondominated = _nondominated(new_fx)
+        new_fx, new_idx = new_fx[nondominated], new_idx[nondominated]
+        survivors = ~_dominated_by(front_fx, new_fx)
+        self._front = np.concatenate([self._front[survivors], new_idx])
+        self._front_fx = np.vstack([front_fx[survivors], new_fx])
+
+    def _normalize(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=float).reshape(-1, len(self._names))
+        return x if self._space is None else self._space.to_unit_cube(x)
+
+    def neighbors(self, x: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the full-fidelity observations within a distance of a point.
+
+        Args:
+            x: The point, shape (dim,).
+            radius: The distance, in unit-cube coordinates if the store has a
+                search space.
+
+        Returns:
+            `X` and `fX` of the observations, nearest first.
+        """
+        _, idx = self._index.query_radius(self._normalize(x)[0], radius)
+        return self._rows([self._index_rows[i] for i in idx])
+
+    def nearest(self, x: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the `k` full-fidelity observations nearest to a point.
+
+        Args:
+            x: The point, shape (dim,).
+            k: The number of observations.
+
+        Returns:
+            The distances, `X` and `fX` of the observations, nearest first.
+        """
+        dist, idx = self._index.query_knn(self._normalize(x)[0], k)
+        return (dist, *self._rows([self._index_rows[i] for i in idx]))
+
+    def lookup(self, x: np.ndarray, tol: float) -> Optional[np.ndarray]:
+        """Return the result of the nearest full-fidelity observation if it is
+        within `tol` of a point, or None if a simulation is needed.
+
+        Args:
+            x: The point, shape (dim,).
+            tol: The tolerance, in unit-cube coordinates if the store has a
+                search space.
+
+        Returns:
+            The `fx` row of the observation or None.
+        """
+        dist, _, fX = self.nearest(x, 1)
+        if len(dist) == 0 or dist[0] > tol:
+            return None
+        return fX[0]
+
+    def novel(self, X: np.ndarray, tol: float) -> np.ndarray:
+        """Select proposals that are not within `tol` of a full-fidelity
+        observation or of an earlier proposal of the batch.
+
+        Args:
+            X: Proposed points, numpy.array, shape (n_samples, dim).
+            tol: The tolerance, in unit-cube coordinates if the store has a
+                search space.
+
+        Returns:
+            A boolean array of shape (n_samples,), True for proposals to keep.
+        """
+        return novel_mask(self._normalize(X), tol, self._index)
+
+    def _rows(self, idx: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        if not idx:
+            return np.zeros((0, len(self._names))), np.zeros((0, 1))
+        return np.array([self._X[i] for i in idx]), np.array([self._fX[i] for i in idx])
 
     def stack_all(self):
         x_np = np.array(self._X)
@@ -31,24 +178,72 @@ class ObservationStore:
 
     @property
     def df(self):
+        import pandas as pd
+
         return pd.DataFrame(
             self.stack_all(),
             columns=[*self._names, 'fx']
         )
 
+    def at_fidelity(self, fidelity: int) -> "ObservationStore":
+        """Return a new store with the observations of a fidelity level.
+        The observations are registered as full fidelity in the new store."""
+        store = ObservationStore(self._names, self._k_best, self._space)
+        idx = [i for i, f in enumerate(self._fidelities) if f == fidelity]
+        if idx:
+            store.register(self.X[idx], self.fX[idx])
+        return store
+
+    @property
+    def fidelities(self) -> np.ndarray:
+        if self._fidelities_array is None:
+            self._fidelities_array = np.array(self._fidelities, dtype=int)
+            self._fidelities_array.flags.writeable = False
+        return self._fidelities_array
+
     @property
     def min(self) -> float:
-        if len(self._fX) == 0:
-            return np.inf
-        else:
-            return np.min(self._fX)
+        """The smallest full-fidelity objective value, over all objectives."""
+        return float(np.min(self._current_best))
 
     @property
     def min_x(self) -> Optional[np.ndarray]:
-        if len(self._fX) == 0:
+        """The full-fidelity point of `min`, the earliest one on ties."""
+        if not self._heaps:
             return None
+        # The best entry of a heap is its largest (-value, -index).
+        best = max(max(heap) for heap in self._heaps)
+        return self._X[-best[1]]
+
+    def top_k(self, k: int, objective: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the `k` full-fidelity observations with the smallest values
+        of an objective, best first.
+
+        Args:
+            k: The number of observations. Served from the incremental index
+                if not larger than `k_best`, otherwise by sorting.
+            objective: The column of `fX` to rank by.
+
+        Returns:
+            `X` of shape (k, dim) and `fX` of shape (k, n_objectives).
+        """
+        if k <= self._k_best and objective < len(self._heaps):
+            order = [-i for _, i in sorted(self._heaps[objective], reverse=True)[:k]]
         else:
-            return self.X[np.array(self.fX).ravel().argmin().item()]
+            idx = np.flatnonzero(self.fidelities == 0)
+            if len(idx) == 0:
+                return self._rows([])
+            fX = self.fX[idx].reshape(len(idx), -1)
+            order = idx[np.argsort(fX[:, objective], kind="stable")[:k]].tolist()
+        return self._rows(order)
+
+    def pareto_front(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the non-dominated full-fidelity observations (minimizing all objectives).
+
+        Returns:
+            `X` of shape (n, dim) and `fX` of shape (n, n_objectives).
+        """
+        return self._rows(self._front.tolist())
 
     @property
     def current_best(self):
@@ -65,3 +260,57 @@ class ObservationStore:
     @property
     def fX(self) -> np.ndarray:
         return np.array(self._fX)
+
+
+# The number of pairwise comparisons made at once by `_dominated_by`.
+_CHUNK_ELEMENTS = 1 << 20
+
+
+def _dominated_by(F: np.ndarray, G: np.ndarray) -> np.ndarray:
+    """For each row of `F`, whether some row of `G` Pareto-dominates it.
+    Rows of `F` are compared in chunks to bound the memory."""
+    result = np.zeros(len(F), dtype=bool)
+    if len(F) == 0 or len(G) == 0:
+        return result
+    step = max(1, _CHUNK_ELEMENTS // (len(G) * F.shape[1]))
+    for lo in range(0, len(F), step):
+        f = F[lo : lo + step, None, :]
+        le = np.all(G[None, :, :] <= f, axis=2)
+        lt = np.any(G[None, :, :] < f, axis=2)
+        result[lo : lo + step] = np.any(le & lt, axis=1)
+    return result
+
+
+def _nondominated(F: np.ndarray) -> np.ndarray:
+    """Return the indices of the rows of `F` that no other row dominates.
+
+    In lexicographic order a row can only be dominated by earlier rows, and
+    by transitivity by an earlier non-dominated one, so each row is only
+    compared with the front found so far.
+    """
+    order = np.lexsort(F.T[::-1])
+    if F.shape[1] == 2 and len(F) > 0:
+        # A row is dominated iff an earlier row, other than its duplicates,
+        # has a second objective not larger than its own.
+        G = F[order]
+        group_start = np.concatenate([[True], np.any(G[1:] != G[:-1], axis=1)])
+        before = np.concatenate([[np.inf], np.minimum.accumulate(G[:-1, 1])])
+        before_group = before[np.maximum.accumulate(np.where(group_start, np.arange(len(G)), 0))]
+        return np.sort(order[before_group > G[:, 1]])
+    if len(F) > 256:
+        # Drop in bulk the rows dominated by the front of the rows with the
+        # smallest sums, so that the loop below only sees the few others.
+        seed = np.argsort(F.sum(axis=1), kind="stable")[:256]
+        seed = seed[_nondominated(F[seed])]
+        candidates = np.flatnonzero(~_dominated_by(F, F[seed]))
+        if len(candidates) < len(F):
+            return candidates[_nondominated(F[candidates])]
+    front = np.empty(len(F), dtype=int)
+    front_F = np.empty_like(F)
+    n = 0
+    for i in order:
+        row, P = F[i], front_F[:n]
+        if n == 0 or not np.any(np.all(P <= row, axis=1) & np.any(P < row, axis=1)):
+            front[n], front_F[n] = i, row
+            n += 1
+    return np.sort(front[:n])
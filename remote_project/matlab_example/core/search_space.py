@@ -1,5 +1,11 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 import numpy as np
-import pandas as pd
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 def to_unit_cube(x, lb, ub):
     """Project to [0, 1]^d from hypercube with bounds lb and ub"""
@@ -15,15 +21,17 @@ def from_unit_cube(x, lb, ub):
     return xx
 
 
-def latin_hypercube(n_pts, dim):
-    """Basic Latin hypercube implementation with center perturbation."""
+def latin_hypercube(n_pts, dim, rng=None):
+    """Basic Latin hypercube implementation with center perturbation.
+    `rng` is a numpy random generator; the global state is used if None."""
+    rng = np.random if rng is None else rng
     X = np.zeros((n_pts, dim))
     centers = (1.0 + 2.0 * np.arange(0.0, n_pts)) / float(2 * n_pts)
     for i in range(dim):  # Shuffle the center locataions for each dimension.
-        X[:, i] = centers[np.random.permutation(n_pts)]
+        X[:, i] = centers[rng.permutation(n_pts)]
 
     # Add some perturbations within each box
-    pert = np.random.uniform(-1.0, 1.0, (n_pts, dim)) / float(2 * n_pts)
+    pert = rng.uniform(-1.0, 1.0, (n_pts, dim)) / float(2 * n_pts)
     X += pert
     return X
 
@@ -54,6 +62,8 @@ class SearchSpace:
         return [p["name"] for p in self.parameters]
 
     def to_dataframe(self, X: np.ndarray) -> pd.DataFrame:
+        import pandas as pd
+
         return pd.DataFrame(X, columns=self.parameter_names)
 
     def from_unit_cube(self, X: np.ndarray) -> np.ndarray:
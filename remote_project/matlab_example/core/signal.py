@@ -2,7 +2,6 @@ from typing import List, Optional, Union
 import logging
 from .parameter import RangeParameter
 import numpy as np
-import pandas as pd
 from numpy.typing import ArrayLike
 from .valuation import Valuation
 
@@ -106,7 +105,7 @@ class InputSignal:
             ]
         )
 
-        idx = np.searchsorted(self.time_points, time_steps)
+        idx = np.searchsorted(self.time_points, time_steps, side="right")
         return values[idx - 1]
 
     def __repr__(self):
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import logging
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .observation import ObservationStore
+from .search_space import SearchSpace, latin_hypercube
+
+logger = logging.getLogger(__name__)
+
+
+def _solve_lower(L: np.ndarray, B: np.ndarray, trans: bool = False) -> np.ndarray:
+    """Solve `L X = B` (or `L^T X = B` if `trans`) for a lower triangular `L`."""
+    # Imported here so that importing `core` does not load scipy.
+    try:
+        from scipy.linalg import solve_triangular
+    except ImportError:
+        solve_triangular = None
+    if solve_triangular is not None:
+        return solve_triangular(L, B, lower=True, trans=1 if trans else 0, check_finite=False)
+    # Row-wise substitution: O(n^2) per right-hand side, like a LAPACK trsm.
+    A = L.T if trans else L
+    X = np.array(B, dtype=float, copy=True)
+    n = len(A)
+    rows = range(n - 1, -1, -1) if trans else range(n)
+    for i in rows:
+        if trans:
+            X[i] -= A[i, i + 1:] @ X[i + 1:]
+        else:
+            X[i] -= A[i, :i] @ X[:i]
+        X[i] /= A[i, i]
+    return X
+
+
+def matern52(X1: np.ndarray, X2: np.ndarray, lengthscales: np.ndarray) -> np.ndarray:
+    """Matern 5/2 kernel with ARD lengthscales and unit variance."""
+    A = X1 / lengthscales
+    B = X2 / lengthscales
+    sq = np.sum(A**2, axis=1)[:, None] + np.sum(B**2, axis=1)[None, :] - 2 * A @ B.T
+    r = np.sqrt(np.maximum(sq, 0.0))
+    s5r = math.sqrt(5.0) * r
+    return (1.0 + s5r + 5.0 / 3.0 * r**2) * np.exp(-s5r)
+
+
+class GaussianProcess:
+    """A Gaussian process with a Matern 5/2 ARD kernel on standardized targets.
+
+    Hyperparameters are chosen by maximizing the marginal likelihood over a
+    set of candidates in `fit`. Between fits, `add` extends the Cholesky
+    factor with the new points in O(n^2 m) instead of refactorizing.
+    """
+
+    def __init__(self, dim: int) -> None:
+        self._dim = dim
+        self._X = np.zeros((0, dim))
+        self._y = np.zeros(0)
+        self._lengthscales = np.full(dim, 0.5)
+        self._noise = 1e-4
+        self._y_mean = 0.0
+        self._y_std = 1.0
+        self._L = np.zeros((0, 0))
+        self._alpha = np.zeros(0)
+
+    @property
+    def lengthscales(self) -> np.ndarray:
+        return self._lengthscales
+
+    @property
+    def n(self) -> int:
+        return len(self._X)
+
+    def _gram(self, X: np.ndarray, lengthscales: np.ndarray, noise: float) -> np.ndarray:
+        return matern52(X, X, lengthscales) + (noise + 1e-8) * np.eye(len(X))
+
+    def fit(
+        self, X: np.ndarray, y: np.ndarray, rng: np.random.Generator, n_candidates: int = 32
+    ) -> None:
+        """Fit the hyperparameters and factorize the kernel matrix from scratch.
+
+        Args:
+            X: Points in the unit cube, shape (n, dim).
+            y: Targets, shape (n, ).
+            rng: The random generator for the hyperparameter candidates.
+            n_candidates: The number of anisotropic hyperparameter candidates.
+        """
+        self._X = np.array(X, dtype=float)
+        self._y_mean = float(np.mean(y))
+        self._y_std = float(np.std(y)) or 1.0
+        self._y = (np.asarray(y, dtype=float) - self._y_mean) / self._y_std
+
+        candidates = [
+            (np.full(self._dim, ls), noise)
+            for ls in (0.05, 0.1, 0.2, 0.4, 0.8, 1.6)
+            for noise in (1e-6, 1e-3, 1e-2)
+        ]
+        best = max(candidates, key=lambda c: self._log_likelihood(*c))
+        for _ in range(n_candidates):
+            ls = np.clip(best[0] * np.exp(rng.normal(0.0, 0.5, self._dim)), 0.005, 5.0)
+            candidate = (ls, best[1])
+            if self._log_likelihood(*candidate) > self._log_likelihood(*best):
+                best = candidate
+        self._lengthscales, self._noise = best
+        self._L = np.linalg.cholesky(self._gram(self._X, self._lengthscales, self._noise))
+        self._alpha = _solve_lower(self._L, _solve_lower(self._L, self._y), trans=True)
+
+    def _log_likelihood(self, lengthscales: np.ndarray, noise: float) -> float:
+        try:
+            L = np.linalg.cholesky(self._gram(self._X, lengthscales, noise))
+        except np.linalg.LinAlgError:
+            return -np.inf
+        a = _solve_lower(L, self._y)
+        return float(-0.5 * a @ a - np.sum(np.log(np.diag(L))))
+
+    def add(self, X: np.ndarray, y: np.ndarray) -> None:
+        """Condition on new points, keeping the hyperparameters and the
+        standardization of the last fit.
+
+        Args:
+            X: Points in the unit cube, shape (m, dim).
+            y: Targets, shape (m, ).
+        """
+        X = np.asarray(X, dtype=float)
+        y = (np.asarray(y, dtype=float) - self._y_mean) / self._y_std
+        K12 = matern52(self._X, X, self._lengthscales)
+        K22 = self._gram(X, self._lengthscales, self._noise)
+        L21 = _solve_lower(self._L, K12).T
+        L22 = np.linalg.cholesky(K22 - L21 @ L21.T)
+        n, m = len(self._X), len(X)
+        L = np.zeros((n + m, n + m))
+        L[:n, :n] = self._L
+        L[n:, :n] = L21
+        L[n:, n:] = L22
+        self._L = L
+        self._X = np.vstack([self._X, X])
+        self._y = np.concatenate([self._y, y])
+        self._alpha = _solve_lower(self._L, _solve_lower(self._L, self._y), trans=True)
+
+    def sample(self, Xs: np.ndarray, n_samples: int, rng: np.random.Generator) -> np.ndarray:
+        """Draw joint posterior samples at the given points.
+
+        Args:
+            Xs: Points in the unit cube, shape (c, dim).
+            n_samples: The number of samples.
+            rng: The random generator.
+
+        Returns:
+            Samples in the original scale of the targets, shape (c, n_samples).
+        """
+        Ks = matern52(self._X, Xs, self._lengthscales)
+        mean = Ks.T @ self._alpha
+        V = _solve_lower(self._L, Ks)
+        cov = matern52(Xs, Xs, self._lengthscales) - V.T @ V
+        cov[np.diag_indices_from(cov)] += 1e-6
+        try:
+            C = np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            # Fall back to independent marginals if the covariance is not numerically PD.
+            C = np.diag(np.sqrt(np.clip(np.diag(cov), 1e-12, None)))
+        f = mean[:, None] + C @ rng.standard_normal((len(Xs), n_samples))
+        return f * self._y_std + self._y_mean
+
+
+class TurboOptimizer:
+    """Batch trust-region Bayesian optimization (TuRBO-1), minimizing.
+
+    A trust region around the best local point is sized by the GP
+    lengthscales and grown or shrunk after consecutive successes or failures;
+    it restarts from a new Latin hypercube design when it collapses. Each
+    `ask` returns `batch_size` points chosen by Thompson sampling, so that
+    all MATLAB slots can be filled at once.
+
+    The GP is refitted every `refit_every` batches and conditioned
+    incrementally in between; its training set is capped at
+    `max_train_size` points nearest to the trust region center.
+    """
+
+    def __init__(
+        self,
+        space: SearchSpace,
+        batch_size: int,
+        *,
+        n_init: Optional[int] = None,
+        max_train_size: int = 512,
+        n_candidates: Optional[int] = None,
+        refit_every: int = 4,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Initialize an optimizer.
+
+        Args:
+            space: The search space.
+            batch_size: The number of points proposed per `ask`.
+            n_init: The size of the initial design of each restart.
+                Defaults to `2 * dim`.
+            max_train_size: The maximum number of points the GP is trained on.
+            n_candidates: The number of Thompson sampling candidates.
+                Defaults to `min(100 * dim, 1000)`.
+            refit_every: Refit the hyperparameters every this many batches.
+            seed: The random seed.
+        """
+        assert batch_size > 0
+        self._space = space
+        self._dim = space.dim
+        self._batch_size = batch_size
+        self._n_init = n_init if n_init is not None else 2 * self._dim
+        self._max_train_size = max_train_size
+        self._n_candidates = n_candidates if n_candidates is not None else min(100 * self._dim, 1000)
+        self._refit_every = refit_every
+        self._rng = np.random.default_rng(seed)
+        self._store = ObservationStore(space.parameter_names, space=space)
+
+        self._length_init = 0.8
+        self._length_min = 0.5**7
+        self._length_max = 1.6
+        self._success_tolerance = 3
+        self._failure_tolerance = math.ceil(max(4.0 / batch_size, self._dim / batch_size))
+        self._n_restarts = 0
+        self._restart()
+
+    @property
+    def store(self) -> ObservationStore:
+        """All observations told to the optimizer, across restarts."""
+        return self._store
+
+    @property
+    def length(self) -> float:
+        """The current side length of the trust region in the unit cube."""
+        return self._length
+
+    @property
+    def n_restarts(self) -> int:
+        return self._n_restarts
+
+    def _restart(self) -> None:
+        self._X = np.zeros((0, self._dim))  # Local observations in the unit cube
+        self._fX = np.zeros(0)
+        self._length = self._length_init
+        self._n_success = 0
+        self._n_failure = 0
+        self._gp: Optional[GaussianProcess] = None
+        self._n_since_fit = 0
+        self._pending_init = latin_hypercube(self._n_init, self._dim, self._rng)
+
+    def ask(self) -> np.ndarray:
+        """Propose the next batch.
+
+        Returns:
+            Points in the search space, shape (batch_size, dim).
+        """
+        if len(self._pending_init) > 0:
+            X = self._pending_init[: self._batch_size]
+            self._pending_init = self._pending_init[self._batch_size:]
+            if len(X) < self._batch_size:
+                X = np.vstack([X, self._rng.uniform(size=(self._batch_size - len(X), self._dim))])
+            return self._space.from_unit_cube(X)
+        return self._space.from_unit_cube(self._thompson_batch())
+
+    def tell(self, X: np.ndarray, fX: np.ndarray) -> None:
+        """Report observed values. Only the first column of `fX` is optimized.
+
+        Args:
+            X: Points in the search space, shape (n, dim).
+            fX: Objective values, shape (n, k).
+        """
+        X = np.asarray(X, dtype=float)
+        fX = np.asarray(fX, dtype=float)
+        assert X.ndim == 2 and fX.ndim == 2 and len(X) == len(fX)
+        self._store.register(X, fX)
+        y = fX[:, 0]
+        X_unit = self._space.to_unit_cube(X)
+
+        if len(self._fX) > 0:
+            self._update_trust_region(y)
+        self._X = np.vstack([self._X, X_unit])
+        self._fX = np.concatenate([self._fX, y])
+
+        if self._length < self._length_min:
+            self._n_restarts += 1
+            logger.info(f"Trust region collapsed. Restarting (restart {self._n_restarts}).")
+            self._restart()
+            return
+        self._update_gp(X_unit, y)
+
+    def _update_trust_region(self, y: np.ndarray) -> None:
+        best = np.min(self._fX)
+        if np.min(y) < best - 1e-3 * abs(best):
+            self._n_success += 1
+            self._n_failure = 0
+        else:
+            self._n_success = 0
+            self._n_failure += 1
+        if self._n_success == self._success_tolerance:
+            self._length = min(2.0 * self._length, self._length_max)
+            self._n_success = 0
+        elif self._n_failure == self._failure_tolerance:
+            self._length /= 2.0
+            self._n_failure = 0
+
+    def _update_gp(self, X_new: np.ndarray, y_new: np.ndarray) -> None:
+        if len(self._X) < 2:
+            return
+        over_capacity = self._gp is not None and self._gp.n + len(X_new) > self._max_train_size
+        if self._gp is not None and not over_capacity and self._n_since_fit + 1 < self._refit_every:
+            try:
+                self._gp.add(X_new, y_new)
+                self._n_since_fit += 1
+                return
+            except np.linalg.LinAlgError:
+                logger.debug("Incremental Cholesky update failed. Refitting the GP.")
+        idx = self._training_subset()
+        self._gp = GaussianProcess(self._dim)
+        self._gp.fit(self._X[idx], self._fX[idx], self._rng)
+        self._n_since_fit = 0
+
+    def _training_subset(self) -> np.ndarray:
+        if len(self._X) <= self._max_train_size:
+            return np.arange(len(self._X))
+        center = self._X[np.argmin(self._fX)]
+        distances = np.sum((self._X - center) ** 2, axis=1)
+        return np.argsort(distances)[: self._max_train_size]
+
+    def _trust_region(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        center = self._X[np.argmin(self._fX)]
+        weights = self._gp.lengthscales / np.mean(self._gp.lengthscales)
+        weights = weights / np.prod(weights) ** (1.0 / self._dim)
+        lb = np.clip(center - weights * self._length / 2.0, 0.0, 1.0)
+        ub = np.clip(center + weights * self._length / 2.0, 0.0, 1.0)
+        return center, lb, ub
+
+    def _thompson_batch(self) -> np.ndarray:
+        if self._gp is None:
+            return self._rng.uniform(size=(self._batch_size, self._dim))
+        center, lb, ub = self._trust_region()
+        n = self._n_candidates
+        pert = lb + (ub - lb) * self._rng.uniform(size=(n, self._dim))
+        # Perturb only a few coordinates of the center in high dimensions.
+        prob = min(20.0 / self._dim, 1.0)
+        mask = self._rng.uniform(size=(n, self._dim)) <= prob
+        empty = np.flatnonzero(mask.sum(axis=1) == 0)
+        mask[empty, self._rng.integers(0, self._dim, size=len(empty))] = True
+        candidates = np.where(mask, pert, center)
+
+        samples = self._gp.sample(candidates, self._batch_size, self._rng)
+        X = np.zeros((self._batch_size, self._dim))
+        for i in range(self._batch_size):
+            j = int(np.argmin(samples[:, i]))
+            X[i] = candidates[j]
+            samples[j, :] = np.inf  # Do not propose the same candidate twice.
+        return X
+
+
+__all__ = [
+    "GaussianProcess",
+    "TurboOptimizer",
+]
@@ -1,11 +1,15 @@
 
 from __future__ import annotations
 
-import pandas as pd
-from typing import List, Optional, Sequence, Union
+import hashlib
+
+from typing import TYPE_CHECKING, List, Optional, Sequence, Union
 
 from .parameter import Parameter
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class Valuation:
     """A class for a valuation of parameters."""
@@ -40,6 +44,8 @@ class Valuation:
 
     @property
     def df(self) -> pd.DataFrame:
+        import pandas as pd
+
         return pd.DataFrame(self.values, index=self.names).T
 
     def get_parameter(self, name: str) -> Parameter:
@@ -102,6 +108,19 @@ class Valuation:
     def clone(self) -> Valuation:
         return Valuation(self._parameters, self._values.copy())
 
+    def digest(self) -> str:
+        """Return a stable hash of the valuation.
+        The digest depends only on the parameter names and values, so equal
+        valuations created in different processes share the same digest.
+
+        Returns:
+            A hex string.
+        """
+        h = hashlib.sha1()
+        for name, value in zip(self.names, self._values):
+            h.update(f"{name}={float(value)!r};".encode())
+        return h.hexdigest()
+
     def __str__(self) -> str:
         maps = ", ".join(
             f"{p.name}={v}" for p, v in zip(self._parameters, self._values)
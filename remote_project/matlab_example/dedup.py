@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .core import Valuation
+from .simulator import SimulinkModel, Trace
+
+logger = logging.getLogger(__name__)
+
+
+class DedupSimulator:
+    """Simulate a model, coalescing requests with identical model inputs.
+
+    Requests are keyed by `SimulinkModel.input_digest`, i.e. by the sampled
+    input matrix and model parameter values rather than by the valuation.
+    Valuations that differ only in control points beyond the time horizon,
+    or in parameters that do not reach MATLAB, share one simulation.
+    Identical requests in flight from several threads wait for the first
+    one, and finished traces are kept in an LRU cache.
+    """
+
+    def __init__(self, model: SimulinkModel, *, cache_size: int = 1024) -> None:
+        """Initialize a simulator.
+
+        Args:
+            model: The model to simulate.
+            cache_size: The maximum number of cached traces. 0 disables the cache,
+                but in-flight requests are still coalesced.
+        """
+        self._model = model
+        self._cache_size = cache_size
+        self._cache: OrderedDict[str, Trace] = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._n_requests = 0
+        self._n_simulations = 0
+
+    @property
+    def model(self) -> SimulinkModel:
+        return self._model
+
+    @property
+    def n_requests(self) -> int:
+        return self._n_requests
+
+    @property
+    def n_simulations(self) -> int:
+        return self._n_simulations
+
+    def key(self, valuation: Valuation, time_horizon: Optional[float] = None) -> str:
+        return self._model.input_digest(valuation, time_horizon)
+
+    def simulate(self, valuation: Valuation, time_horizon: Optional[float] = None) -> Trace:
+        """Simulate the model, reusing identical finished or in-flight simulations.
+
+        Args:
+            valuation: A valuation of the parameters of the model.
+            time_horizon: The time horizon of the simulation.
+
+        Returns:
+            The simulation result, shared with other identical requests.
+        """
+        key = self.key(valuation, time_horizon)
+        with self._lock:
+            self._n_requests += 1
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+
+        if not owner:
+            logger.debug(f"Coalescing request {key} onto an in-flight simulation.")
+            return future.result()
+
+        try:
+            trace = self._model.simulate(valuation, time_horizon)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            self._n_simulations += 1
+            self._put(key, trace)
+        future.set_result(trace)
+        return trace
+
+    def simulate_batch(
+        self, valuations: Sequence[Valuation], time_horizon: Optional[float] = None
+    ) -> List[Trace]:
+        """Simulate valuations, running each distinct model input once.
+
+        Args:
+            valuations: Valuations of the parameters of the model.
+            time_horizon: The time horizon of the simulations.
+
+        Returns:
+            The simulation results in the order of the valuations.
+        """
+        keys = [self.key(v, time_horizon) for v in valuations]
+        first: Dict[str, Valuation] = {}
+        for key, valuation in zip(keys, valuations):
+            first.setdefault(key, valuation)
+        if len(first) < len(valuations):
+            logger.debug(f"Deduplicated {len(valuations)} requests to {len(first)} simulations.")
+        traces = {key: self.simulate(valuation, time_horizon) for key, valuation in first.items()}
+        # Requests that were not simulated above were coalesced onto another one.
+        with self._lock:
+            self._n_requests += len(valuations) - len(first)
+        return [traces[key] for key in keys]
+
+    def _put(self, key: str, trace: Trace) -> None:
+        if self._cache_size <= 0:
+            return
+        self._cache[key] = trace
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+
+class RequestCoalescer:
+    """Coalesce identical remote requests onto one task.
+
+    Used on the driver in front of Ray tasks: the first request of a key
+    launches the task, and later requests of the same key get the same
+    object reference, so the result is simulated once and fanned out.
+    """
+
+    def __init__(self, *, max_size: int = 65536) -> None:
+        """Initialize a coalescer.
+
+        Args:
+            max_size: The maximum number of remembered references.
+        """
+        self._refs: OrderedDict[str, Any] = OrderedDict()
+        self._max_size = max_size
+
+    def submit(self, key: str, launch: Callable[[], Any]) -> Any:
+        """Get the reference of the request `key`, launching it if new.
+
+        Args:
+            key: The key of the request, e.g. `SimulinkModel.input_digest(...)`.
+            launch: A function launching the request, e.g. `lambda: task.remote(v)`.
+
+        Returns:
+            The (possibly shared) object reference.
+        """
+        if key in self._refs:
+            self._refs.move_to_end(key)
+            return self._refs[key]
+        ref = self._refs[key] = launch()
+        while len(self._refs) > self._max_size:
+            self._refs.popitem(last=False)
+        return ref
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+
+__all__ = [
+    "DedupSimulator",
+    "RequestCoalescer",
+]
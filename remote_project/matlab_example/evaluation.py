@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .core import Valuation
+from .segmented import OnlineMonitor, simulate_segmented
+from .simulator import Fidelity, SimulinkModel, Trace
+
+logger = logging.getLogger(__name__)
+
+Objective = Callable[[Trace], float]
+
+
+class ThresholdObjective(OnlineMonitor):
+    """Robustness of the requirement `always (variable < threshold)`
+    (or `always (variable > threshold)` if `upper=False`).
+    A negative value means the requirement is falsified.
+
+    Unlike lambdas, instances are cheap to pickle and send to Ray workers.
+    """
+
+    def __init__(self, variable: str, threshold: float, *, upper: bool = True) -> None:
+        """Initialize an objective.
+
+        Args:
+            variable: The name of the output variable.
+            threshold: The threshold of the variable.
+            upper: Whether the threshold is an upper bound of the variable.
+        """
+        self._variable = variable
+        self._threshold = threshold
+        self._upper = upper
+
+    @property
+    def variable(self) -> str:
+        return self._variable
+
+    @property
+    def threshold(self) -> float:
+        return self._threshold
+
+    @property
+    def upper(self) -> bool:
+        return self._upper
+
+    def margins(self, trace: Trace) -> np.ndarray:
+        """Return the point-wise robustness at each time step of the trace."""
+        values = trace[self._variable]
+        if self._upper:
+            return self._threshold - values
+        return values - self._threshold
+
+    def __call__(self, trace: Trace) -> float:
+        return float(np.min(self.margins(trace)))
+
+    def bounds(self, trace: Trace) -> Tuple[float, float]:
+        """Bound the robustness of the complete trace given a prefix of it.
+        Later samples can only lower the minimum, so the robustness of the
+        prefix is an upper bound; nothing is known about the lower bound.
+
+        Args:
+            trace: A prefix of the trace.
+
+        Returns:
+            The lower and upper bounds.
+        """
+        return -np.inf, self(trace)
+
+    def __repr__(self) -> str:
+        op = "<" if self._upper else ">"
+        return f"ThresholdObjective(always {self._variable} {op} {self._threshold})"
+
+
+class Evaluation:
+    """The result of evaluating an objective on a simulation."""
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        fx: float,
+        trace: Optional[Trace] = None,
+        *,
+        elapsed: Optional[float] = None,
+    ) -> None:
+        """Initialize an evaluation.
+
+        Args:
+            x: The values of the control parameters of the model.
+            fx: The value of the objective.
+            trace: The (possibly down-sampled) simulation result, if kept.
+            elapsed: The wall-clock time of the simulation in seconds.
+        """
+        self._x = x
+        self._fx = fx
+        self._trace = trace
+        self._elapsed = elapsed
+
+    @property
+    def x(self) -> np.ndarray:
+        return self._x
+
+    @property
+    def fx(self) -> float:
+        return self._fx
+
+    @property
+    def trace(self) -> Optional[Trace]:
+        return self._trace
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        return self._elapsed
+
+    def __repr__(self) -> str:
+        return f"Evaluation(x={self._x}, fx={self._fx}, trace={'kept' if self._trace is not None else None})"
+
+
+def evaluate(
+    model: SimulinkModel,
+    valuations: Sequence[Valuation],
+    objective: Objective,
+    *,
+    keep_traces: str = "none",
+    top_k: int = 0,
+    falsification_threshold: float = 0.0,
+    n_trace_points: Optional[int] = None,
+    segment_length: Optional[float] = None,
+    fidelity: Optional[Fidelity] = None,
+) -> List[Evaluation]:
+    """Simulate valuations and evaluate the objective next to the simulator,
+    so that only `(x, fx)` and the requested traces leave the worker.
+
+    Args:
+        model: The model to simulate.
+        valuations: The valuations to simulate.
+        objective: A function mapping a trace to a scalar (smaller is better).
+        keep_traces: Which traces to return: "none", "all", or "falsifying"
+            (traces whose objective is below `falsification_threshold`).
+        top_k: Additionally keep the traces of the `top_k` smallest objectives.
+        falsification_threshold: The threshold for `keep_traces="falsifying"`.
+        n_trace_points: If given, kept traces are down-sampled to this many
+            evenly spaced time steps.
+        segment_length: If given, simulate in segments of this length and stop
+            as soon as the objective decides whether the run is falsifying
+            (see `segmented.simulate_segmented`). The objective must have a
+            `bounds` method, e.g. `ThresholdObjective`.
+        fidelity: The simulation fidelity. If `None`, the model settings are used.
+
+    Returns:
+        The evaluations in the order of the valuations.
+    """
+    if keep_traces not in ("none", "all", "falsifying"):
+        raise ValueError(f"Unknown trace retention {keep_traces}.")
+    if segment_length is not None and fidelity is not None:
+        raise ValueError("Segmented simulation does not support fidelity overrides.")
+
+    results: List[Tuple[np.ndarray, float, Trace, float]] = []
+    for valuation in valuations:
+        full_valuation = model.create_default_valuation().patch(valuation)
+        start = time.perf_counter()
+        if segment_length is None:
+            trace = model.simulate(full_valuation, fidelity=fidelity)
+        else:
+            trace = simulate_segmented(
+                model,
+                full_valuation,
+                objective,
+                segment_length=segment_length,
+                threshold=falsification_threshold,
+            )
+        elapsed = time.perf_counter() - start
+        fx = float(objective(trace))
+        results.append((np.array(full_valuation.values, dtype=float), fx, trace, elapsed))
+
+    keep = set()
+    if keep_traces == "all":
+        keep.update(range(len(results)))
+    elif keep_traces == "falsifying":
+        keep.update(i for i, (_, fx, _, _) in enumerate(results) if fx < falsification_threshold)
+    if top_k > 0:
+        keep.update(heapq.nsmallest(top_k, range(len(results)), key=lambda i: results[i][1]))
+
+    evaluations = []
+    for i, (x, fx, trace, elapsed) in enumerate(results):
+        kept = None
+        if i in keep:
+            kept = trace if n_trace_points is None else _downsample(trace, n_trace_points)
+        evaluations.append(Evaluation(x, fx, kept, elapsed=elapsed))
+    logger.debug(f"Evaluated {len(evaluations)} valuations, keeping {len(keep)} traces.")
+    return evaluations
+
+
+def stack_evaluations(evaluations: Sequence[Evaluation]) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack evaluations into arrays accepted by `ObservationStore.register`.
+
+    Returns:
+        `X` of shape (n, dim) and `fX` of shape (n, 1).
+    """
+    X = np.array([e.x for e in evaluations], dtype=float)
+    fX = np.array([[e.fx] for e in evaluations], dtype=float)
+    return X, fX
+
+
+def _downsample(trace: Trace, n_points: int) -> Trace:
+    time_steps = trace.time_steps
+    if len(time_steps) <= n_points:
+        return trace
+    return trace.resample(np.linspace(time_steps[0], time_steps[-1], n_points))
+
+
+__all__ = [
+    "Objective",
+    "ThresholdObjective",
+    "Evaluation",
+    "evaluate",
+    "stack_evaluations",
+]
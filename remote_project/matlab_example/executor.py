@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+from .faults import is_transient_error
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StreamingExecutor:
+    """Run Ray tasks over a stream of items with bounded concurrency.
+
+    Items are pulled from the input lazily, at most `max_in_flight` tasks are
+    pending at any time, and results are yielded in completion order. This
+    keeps the memory of the driver bounded for large sweeps, unlike calling
+    `ray.get` on the whole list of tasks.
+
+    Tasks lost with their node (e.g. a preempted spot instance) or failed
+    with a transient MATLAB error are resubmitted up to `max_resubmits`
+    times per item.
+    """
+
+    def __init__(
+        self,
+        submit: Callable[[Any], Any],
+        *,
+        max_in_flight: int = 8,
+        max_resubmits: int = 2,
+    ) -> None:
+        """Initialize an executor.
+
+        Args:
+            submit: A function that submits the task of an item and returns
+                its object reference, e.g. `lambda x: run_simulator.remote(x)`.
+            max_in_flight: The maximum number of pending tasks.
+            max_resubmits: The maximum number of resubmissions per item.
+        """
+        assert max_in_flight > 0
+        self._submit = submit
+        self._max_in_flight = max_in_flight
+        self._max_resubmits = max_resubmits
+        self._in_flight: Dict[Any, Tuple[Any, int]] = {}
+
+    @property
+    def max_in_flight(self) -> int:
+        return self._max_in_flight
+
+    @property
+    def num_in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def map_unordered(
+        self,
+        items: Iterable[T],
+        stop: Optional[Callable[[T, Any], bool]] = None,
+    ) -> Iterator[Tuple[T, Any]]:
+        """Submit a task per item and yield `(item, result)` as tasks complete.
+
+        Args:
+            items: The inputs of the tasks. Consumed lazily.
+            stop: A predicate on `(item, result)`. When it returns True, the
+                remaining tasks are cancelled and the iteration ends after
+                yielding that result.
+
+        Yields:
+            Pairs of an item and the result of its task.
+        """
+        import ray
+
+        it = iter(items)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(self._in_flight) < self._max_in_flight:
+                    try:
+                        item = next(it)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    self._in_flight[self._submit(item)] = (item, 0)
+                if not self._in_flight:
+                    return
+
+                [ready], _ = ray.wait(list(self._in_flight), num_returns=1)
+                item, n_resubmits = self._in_flight.pop(ready)
+                try:
+                    result = ray.get(ready)
+                except Exception as e:
+                    if n_resubmits >= self._max_resubmits or not _is_recoverable(e):
+                        raise
+                    logger.warning(
+                        f"Task failed ({type(e).__name__}). "
+                        f"Resubmitting ({n_resubmits + 1}/{self._max_resubmits})."
+                    )
+                    self._in_flight[self._submit(item)] = (item, n_resubmits + 1)
+                    continue
+                yield item, result
+                if stop is not None and stop(item, result):
+                    logger.info(f"Stop condition reached. Cancelling {len(self._in_flight)} tasks.")
+                    return
+        finally:
+            # Also reached when the consumer breaks out of the loop.
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Cancel all pending tasks."""
+        import ray
+
+        for ref in self._in_flight:
+            ray.cancel(ref)
+        self._in_flight.clear()
+
+
+def _is_recoverable(error: BaseException) -> bool:
+    """Whether a failed task may succeed if resubmitted."""
+    import ray.exceptions
+
+    lost = tuple(
+        getattr(ray.exceptions, name)
+        for name in ("WorkerCrashedError", "NodeDiedError", "ObjectLostError", "OwnerDiedError")
+        if hasattr(ray.exceptions, name)
+    )
+    if isinstance(error, lost):
+        return True
+    if isinstance(error, ray.exceptions.RayTaskError):
+        return is_transient_error(error.cause) if error.cause is not None else False
+    return False
+
+
+__all__ = [
+    "StreamingExecutor",
+]
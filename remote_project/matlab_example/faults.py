@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import logging
+import sys
+import time
+from typing import Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Substrings of MATLAB error messages caused by the engine or the host rather
+# than by the model or its inputs. They are specific to engine termination,
+# lost IPC and license checkout: generic words such as "session" or
+# "connection" also appear in model errors (e.g. unconnected ports) that
+# fail again on any engine.
+_TRANSIENT_MESSAGES = (
+    "matlab has terminated",
+    "matlab process terminated",
+    "matlab process cannot be found",
+    "matlab process is not running",
+    "failed to communicate with the matlab process",
+    "lost connection to the matlab process",
+    "license checkout failed",
+    "license manager error",
+    "unable to check out a license",
+    "out of memory",
+    "timed out",
+)
+
+
+class SimulationError(RuntimeError):
+    """Raised when MATLAB fails to simulate a model.
+
+    A transient error (e.g., the engine died or lost its license) may succeed
+    on another engine, while a deterministic one (e.g., an invalid input)
+    fails again on retry.
+    """
+
+    def __init__(self, message: str, *, transient: bool = False) -> None:
+        super().__init__(message)
+        self.transient = transient
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Classify an exception raised by the MATLAB engine.
+
+    Args:
+        error: The exception.
+
+    Returns:
+        True if retrying on a fresh engine may succeed.
+    """
+    if isinstance(error, SimulationError):
+        return error.transient
+    # A MATLAB error implies that `matlab.engine` is loaded; do not import it here.
+    engine = sys.modules.get("matlab.engine")
+    if engine is not None:
+        if isinstance(error, (engine.RejectedExecutionError, engine.EngineError)):
+            return True
+        if isinstance(error, engine.MatlabExecutionError):
+            message = str(error).lower()
+            return any(m in message for m in _TRANSIENT_MESSAGES)
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def retry_transient(
+    fn: Callable[[], T],
+    *,
+    restart: Callable[[], None],
+    max_retries: int = 2,
+    backoff: float = 1.0,
+) -> T:
+    """Call `fn`, restarting the engine and retrying on transient errors.
+    Deterministic errors are raised immediately.
+
+    Example:
+        >>> recycler = RecyclingEngine(policy, setup=setup)
+        >>> recycler.attach(model)
+        >>> trace = retry_transient(lambda: model.simulate(v), restart=recycler.recycle)
+
+    Args:
+        fn: The function to call, typically a `SimulinkModel.simulate` call.
+        restart: A function that replaces the engine used by `fn`.
+        max_retries: The maximum number of retries.
+        backoff: The delay before the first retry in seconds, doubled on each retry.
+
+    Returns:
+        The return value of `fn`.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not is_transient_error(e):
+                raise
+            logger.warning(
+                f"Transient MATLAB error ({e}). Restarting the engine and retrying "
+                f"({attempt + 1}/{max_retries})."
+            )
+            time.sleep(backoff * 2**attempt)
+            restart()
+    raise AssertionError("unreachable")
+
+
+__all__ = [
+    "SimulationError",
+    "is_transient_error",
+    "retry_transient",
+]
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import logging
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .core import ObservationStore, Valuation
+from .evaluation import Evaluation, Objective, evaluate, stack_evaluations
+from .simulator import Fidelity, SimulinkModel
+
+logger = logging.getLogger(__name__)
+
+FULL_FIDELITY = 0
+COARSE_FIDELITY = 1
+
+
+class MultiFidelityScreening:
+    """Screen candidates with cheap simulations before simulating them accurately.
+
+    Each batch is first simulated at a coarse fidelity (a larger input time
+    step and/or relaxed solver tolerances). Only the most promising fraction
+    of the batch, and any candidate whose coarse objective is below
+    `always_refine_below`, is simulated again at full fidelity. Both results
+    are registered in the observation store with their fidelity level, so
+    the best-so-far only reflects full-fidelity results.
+    """
+
+    def __init__(
+        self,
+        model: SimulinkModel,
+        objective: Objective,
+        coarse: Fidelity,
+        *,
+        refine_ratio: float = 0.2,
+        always_refine_below: Optional[float] = None,
+        store: Optional[ObservationStore] = None,
+    ) -> None:
+        """Initialize a pipeline.
+
+        Args:
+            model: The model to simulate.
+            objective: A function mapping a trace to a scalar (smaller is better).
+            coarse: The fidelity of the screening simulations.
+            refine_ratio: The fraction of each batch re-simulated at full fidelity.
+            always_refine_below: Candidates whose coarse objective is below this
+                value are always re-simulated, e.g. a margin above the
+                falsification threshold to absorb the coarse error.
+            store: The observation store. A new one is created if `None`.
+        """
+        assert 0 <= refine_ratio <= 1
+        self._model = model
+        self._objective = objective
+        self._coarse = coarse
+        self._refine_ratio = refine_ratio
+        self._always_refine_below = always_refine_below
+        self._store = (
+            store
+            if store is not None
+            else ObservationStore([p.name for p in model.control_parameters])
+        )
+
+    @property
+    def store(self) -> ObservationStore:
+        return self._store
+
+    def select(self, coarse_fx: np.ndarray) -> np.ndarray:
+        """Return the indices of the candidates to refine, best first."""
+        order = np.argsort(coarse_fx, kind="stable")
+        n_refine = int(np.ceil(self._refine_ratio * len(coarse_fx)))
+        selected = set(order[:n_refine].tolist())
+        if self._always_refine_below is not None:
+            selected.update(np.flatnonzero(coarse_fx < self._always_refine_below).tolist())
+        return np.array([i for i in order if i in selected], dtype=int)
+
+    def evaluate(self, valuations: Sequence[Valuation], **kwargs) -> List[Evaluation]:
+        """Screen a batch of valuations and refine the promising ones.
+
+        Args:
+            valuations: The candidates.
+            kwargs: Keyword arguments of `evaluation.evaluate` for the
+                full-fidelity simulations (e.g. `keep_traces`).
+
+        Returns:
+            The full-fidelity evaluations of the refined candidates.
+        """
+        if len(valuations) == 0:
+            return []
+        coarse = evaluate(self._model, valuations, self._objective, fidelity=self._coarse)
+        X, fX = stack_evaluations(coarse)
+        self._store.register(X, fX, fidelity=COARSE_FIDELITY)
+
+        refined = self.select(fX.ravel())
+        logger.info(f"Refining {len(refined)} of {len(valuations)} candidates at full fidelity.")
+        if len(refined) == 0:
+            return []
+        fine = evaluate(self._model, [valuations[i] for i in refined], self._objective, **kwargs)
+        X, fX = stack_evaluations(fine)
+        self._store.register(X, fX, fidelity=FULL_FIDELITY)
+        return fine
+
+
+__all__ = [
+    "FULL_FIDELITY",
+    "COARSE_FIDELITY",
+    "MultiFidelityScreening",
+]
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .core import Valuation
+from .simulator import SimulinkModel, Trace, slice_input
+
+logger = logging.getLogger(__name__)
+
+SegmentKey = str
+
+
+class _PrefixNode:
+    """A node of the prefix tree. The path from the root is the sequence of
+    segment keys, i.e. the input values on each segment so far."""
+
+    def __init__(self, depth: int, parent: Optional[_PrefixNode] = None) -> None:
+        self.depth = depth
+        self.parent = parent
+        self.children: Dict[SegmentKey, _PrefixNode] = {}
+        # Set while the node holds a snapshot.
+        self.state: Optional[str] = None
+        self.trace: Optional[Trace] = None
+
+
+class IncrementalSimulator:
+    """Simulate a model by resuming from saved operating points.
+
+    The time horizon is split at the control-point boundaries of the input
+    signals. Two valuations whose model inputs agree on the first `k`
+    segments have identical states at the end of segment `k`. After each segment the operating point is saved in the
+    MATLAB workspace and indexed in a prefix tree keyed by the segment
+    inputs; a new simulation resumes from the deepest matching snapshot and
+    splices the stored trace prefix with the newly simulated suffix.
+
+    Local searches that perturb late control points skip most of the horizon.
+    """
+
+    def __init__(self, model: SimulinkModel, *, max_snapshots: int = 256) -> None:
+        """Initialize a simulator.
+
+        Args:
+            model: The model to simulate. The input signals must share the
+                time horizon of the model.
+            max_snapshots: The maximum number of operating points kept in the
+                MATLAB workspace, at least 1. The least recently used ones
+                are cleared.
+        """
+        assert max_snapshots >= 1
+        self._model = model
+        self._max_snapshots = max_snapshots
+        self._root = _PrefixNode(0)
+        self._snapshots: OrderedDict[str, _PrefixNode] = OrderedDict()
+        self._ids = itertools.count()
+        self._boundaries = self._induce_boundaries()
+        self._simulated_time = 0.0
+        self._requested_time = 0.0
+
+    @property
+    def boundaries(self) -> List[float]:
+        """The segment boundaries, from 0 to the time horizon."""
+        return self._boundaries
+
+    @property
+    def saved_ratio(self) -> float:
+        """The ratio of the requested simulation time that was skipped."""
+        if self._requested_time == 0:
+            return 0.0
+        return 1.0 - self._simulated_time / self._requested_time
+
+    def _induce_boundaries(self) -> List[float]:
+        horizon = self._model.time_horizon
+        points = {0.0, float(horizon)}
+        for signal in self._model.input_signals:
+            points.update(float(t) for t in signal.time_points if 0 < t < horizon)
+        return sorted(points)
+
+    def segment_keys(
+        self, valuation: Valuation, model_input: Optional[np.ndarray] = None
+    ) -> List[SegmentKey]:
+        """Return the keys of the segments for a valuation.
+        The key of a segment is the digest of the input rows MATLAB reads on
+        it (which may straddle a boundary, as the input is interpolated);
+        the first key also covers the values of the model parameters."""
+        full_valuation = self._model.create_default_valuation().patch(valuation)
+        if model_input is None:
+            model_input = self._model.build_input(full_valuation)
+        keys = []
+        for start, end in zip(self._boundaries[:-1], self._boundaries[1:]):
+            rows = np.ascontiguousarray(slice_input(model_input, start, end), dtype=float)
+            keys.append(hashlib.sha1(rows.tobytes()).hexdigest())
+        keys[0] = full_valuation.filter(self._model.model_parameters).digest() + keys[0]
+        return keys
+
+    def simulate(self, valuation: Valuation) -> Trace:
+        """Simulate the model up to its time horizon.
+
+        Args:
+            valuation: A valuation of the parameters of the model.
+
+        Returns:
+            The simulation result.
+        """
+        model_input = self._model.build_input(valuation)
+        keys = self.segment_keys(valuation, model_input)
+        # Find the deepest snapshot along the path of the valuation.
+        node, resume = self._root, self._root
+        for key in keys:
+            child = node.children.get(key)
+            if child is None:
+                break
+            node = child
+            if node.state is not None:
+                resume = node
+        if resume.depth == len(keys):
+            self._touch(resume)
+            self._requested_time += self._boundaries[-1]
+            return resume.trace
+
+        parts = [] if resume.trace is None else [resume.trace]
+        if resume.state is not None:
+            self._touch(resume)
+        node = resume
+        for depth in range(resume.depth, len(keys)):
+            start, end = self._boundaries[depth], self._boundaries[depth + 1]
+            child = node.children.get(keys[depth])
+            if child is None:
+                child = node.children[keys[depth]] = _PrefixNode(depth + 1, node)
+            state = f"pfx_{id(self):x}_{next(self._ids)}"
+            segment = self._model.simulate_segment(
+                start,
+                end,
+                slice_input(model_input, start, end),
+                initial_state=node.state,
+                final_state=state,
+            )
+            parts.append(segment)
+            self._simulated_time += end - start
+            self._save(child, state, Trace.concatenate(parts))
+            node = child
+        self._requested_time += self._boundaries[-1]
+        return node.trace
+
+    def clear(self) -> None:
+        """Drop all snapshots and clear them from the MATLAB workspace."""
+        while self._snapshots:
+            self._evict()
+        self._root = _PrefixNode(0)
+
+    def _save(self, node: _PrefixNode, state: str, trace: Trace) -> None:
+        if node.state is not None:
+            self._clear_state(node.state)
+            del self._snapshots[node.state]
+        node.state = state
+        node.trace = trace
+        self._snapshots[state] = node
+        while len(self._snapshots) > self._max_snapshots:
+            self._evict()
+
+    def _touch(self, node: _PrefixNode) -> None:
+        self._snapshots.move_to_end(node.state)
+
+    def _evict(self) -> None:
+        state, node = self._snapshots.popitem(last=False)
+        self._clear_state(state)
+        node.state = None
+        node.trace = None
+        # Prune branches without snapshots.
+        while node.parent is not None and node.state is None and not node.children:
+            parent = node.parent
+            parent.children = {k: c for k, c in parent.children.items() if c is not node}
+            node = parent
+
+    def _clear_state(self, state: str) -> None:
+        self._model.clear_variables(state)
+
+
+__all__ = [
+    "IncrementalSimulator",
+]
@@ -1,27 +1,66 @@
+import importlib
+import importlib.util
 import logging
-from typing import Optional
+import sys
+from typing import Any, List
 
-try:
-    import matlab
-    import matlab.engine
-except ImportError:
-    _no_matlab = True
-else:
-    _no_matlab = False
+# The submodules are imported on first access (PEP 562), so that importing the
+# package does not load `matlab.engine` in processes that never connect.
+_exports = {
+    "get_matlab_engine": "global_engine",
+    "connection": "context",
+    "MatlabEngineManager": "sessions",
+    "is_available_matlab": "sessions",
+    "find_matlab": "sessions",
+    "RecyclingEngine": "recycling",
+    "RecyclingPolicy": "recycling",
+    "ModelRegistry": "registry",
+    "get_model_registry": "registry",
+    "exit_engine": "registry",
+    "CpuSlot": "affinity",
+    "CpuSlotPool": "affinity",
+    "apply_slot": "affinity",
+    "MatlabWorker": "worker",
+    "WorkerPool": "worker",
+    "create_worker_actors": "worker",
+}
 
-from .sessions import find_matlab, MatlabEngineManager, is_available_matlab
-from .context import connection
-from .global_engine import get_matlab_engine
+_no_matlab = "matlab" not in sys.modules and importlib.util.find_spec("matlab") is None
 
 logger = logging.getLogger(__name__)
 
 if _no_matlab:
     logger.warning("Matlab is not installed. Connection to Matlab cannot be used.")
 
+
+def __getattr__(name: str) -> Any:
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted([*globals(), *_exports])
+
+
 __all__ = [
     "get_matlab_engine",
     "connection",
     "MatlabEngineManager",
     "is_available_matlab",
     "find_matlab",
+    "RecyclingEngine",
+    "RecyclingPolicy",
+    "ModelRegistry",
+    "get_model_registry",
+    "exit_engine",
+    "CpuSlot",
+    "CpuSlotPool",
+    "apply_slot",
+    "MatlabWorker",
+    "WorkerPool",
+    "create_worker_actors",
 ]
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# Overrides the slots, e.g. "0-3;4-7;8-11;12-15" or "0,2;1,3".
+SLOTS_ENV = "MATLAB_CPU_SLOTS"
+
+
+class CpuSlot:
+    """A disjoint set of CPUs for one MATLAB session."""
+
+    def __init__(self, index: int, cpus: Sequence[int]) -> None:
+        self._index = index
+        self._cpus = sorted(cpus)
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    @property
+    def cpus(self) -> List[int]:
+        return self._cpus
+
+    @property
+    def n_threads(self) -> int:
+        """The number of MATLAB compute threads matching the slot."""
+        return len(self._cpus)
+
+    def __repr__(self) -> str:
+        return f"CpuSlot(index={self._index}, cpus={self._cpus})"
+
+
+class CpuSlotPool:
+    """Slots of the CPUs of a node, shared by the processes of the node.
+
+    A slot is reserved by a file named after it in `slot_dir`, like the PID
+    files of `MatlabEngineManager`. The file records the reserving process
+    and the pinned MATLAB process, so the mapping can be inspected with
+    `mapping()` or by reading the files. Slots of dead processes are reclaimed.
+    """
+
+    def __init__(self, slot_dir: Union[str, os.PathLike], slots: Sequence[Sequence[int]]) -> None:
+        """Initialize a pool.
+
+        Args:
+            slot_dir: The directory of the reservation files. It must be
+                shared by the processes of the node and use the same slots.
+            slots: The CPUs of each slot.
+        """
+        if not os.path.isdir(slot_dir):
+            raise ValueError(f"Path {slot_dir} does not exist or is not a directory.")
+        assert len(slots) > 0
+        self._slot_dir = slot_dir
+        self._slots = [CpuSlot(i, cpus) for i, cpus in enumerate(slots)]
+
+    @classmethod
+    def from_ray(
+        cls, slot_dir: Union[str, os.PathLike], cpus_per_slot: Optional[int] = None
+    ) -> CpuSlotPool:
+        """Create the pool of this node.
+
+        The slots are taken from the `MATLAB_CPU_SLOTS` environment variable
+        if set. Otherwise the CPUs of the node are split into slots of
+        `cpus_per_slot` CPUs, which defaults to the CPUs Ray assigned to the
+        current task or actor (e.g. 2 for `num_cpus=2`).
+
+        Args:
+            slot_dir: The directory of the reservation files.
+            cpus_per_slot: The number of CPUs per slot.
+
+        Returns:
+            The pool.
+        """
+        override = os.environ.get(SLOTS_ENV)
+        if override:
+            slots = parse_slots(override)
+            logger.info(f"CPU slots from {SLOTS_ENV}: {slots}")
+            return cls(slot_dir, slots)
+        if cpus_per_slot is None:
+            cpus_per_slot = _ray_assigned_cpus()
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        if not cpus:
+            cpus = list(range(os.cpu_count() or 1))
+        cpus_per_slot = max(1, min(cpus_per_slot, len(cpus)))
+        n_slots = len(cpus) // cpus_per_slot
+        slots = [cpus[i * cpus_per_slot : (i + 1) * cpus_per_slot] for i in range(n_slots)]
+        logger.info(f"{n_slots} CPU slots of {cpus_per_slot} CPUs: {slots}")
+        return cls(slot_dir, slots)
+
+    @property
+    def slots(self) -> List[CpuSlot]:
+        return self._slots
+
+    def reserve(self, matlab_pid: Optional[int] = None) -> CpuSlot:
+        """Reserve a free slot.
+        Raises an exception if all slots are reserved.
+
+        Args:
+            matlab_pid: The PID of the MATLAB process pinned to the slot, if known.
+
+        Returns:
+            The slot.
+        """
+        record = json.dumps({"owner": os.getpid(), "matlab": matlab_pid})
+        for slot in self._slots:
+            path = self._path(slot)
+            if os.path.exists(path) and self._is_stale(path):
+                logger.warning(f"Reclaiming CPU slot {slot.index} of a dead process.")
+                os.remove(path)
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(record)
+            logger.info(f"Reserved {slot}.")
+            return slot
+        raise RuntimeError(f"All {len(self._slots)} CPU slots are reserved.")
+
+    def update(self, slot: CpuSlot, matlab_pid: int) -> None:
+        """Record the PID of the MATLAB process pinned to a slot reserved by
+        this process, e.g. once the MATLAB started after `reserve` is running."""
+        path = self._path(slot)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"owner": os.getpid(), "matlab": matlab_pid}, f)
+        # Readers see either the old or the new record.
+        os.replace(tmp_path, path)
+
+    def release(self, slot: CpuSlot) -> None:
+        """Release a slot reserved by this process."""
+        try:
+            os.remove(self._path(slot))
+        except FileNotFoundError:
+            logger.warning(f"Releasing non-reserved {slot}.")
+
+    def mapping(self) -> Dict[int, Dict[str, Any]]:
+        """Return the reserved slots with their CPUs and processes."""
+        result = {}
+        for slot in self._slots:
+            try:
+                with open(self._path(slot), "r") as f:
+                    record = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            result[slot.index] = {"cpus": slot.cpus, **record}
+        return result
+
+    def _path(self, slot: CpuSlot) -> str:
+        return os.path.join(self._slot_dir, f"cpu_slot_{slot.index}.json")
+
+    @staticmethod
+    def _is_stale(path: str) -> bool:
+        from .sessions import _is_process_dead
+
+        try:
+            with open(path, "r") as f:
+                owner = json.load(f)["owner"]
+        except (FileNotFoundError, ValueError, KeyError):
+            # Being written by another process.
+            return False
+        return _is_process_dead(owner)
+
+
+def parse_slots(spec: str) -> List[List[int]]:
+    """Parse slots such as "0-3;4-7" or "0,2;1,3"."""
+    slots = []
+    for part in spec.split(";"):
+        cpus: List[int] = []
+        for item in part.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            if "-" in item:
+                lo, hi = item.split("-")
+                cpus.extend(range(int(lo), int(hi) + 1))
+            else:
+                cpus.append(int(item))
+        if cpus:
+            slots.append(cpus)
+    if not slots:
+        raise ValueError(f"Invalid CPU slots: {spec}")
+    return slots
+
+
+def pin_process(pid: int, cpus: Sequence[int]) -> None:
+    """Set the CPU affinity of all threads of a process.
+    Threads started later inherit the affinity of their creator."""
+    task_dir = f"/proc/{pid}/task"
+    tids = [int(t) for t in os.listdir(task_dir)] if os.path.isdir(task_dir) else [pid]
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            # The thread exited meanwhile.
+            pass
+
+
+def apply_slot(matlab_engine: Any, slot: CpuSlot, matlab_pid: Optional[int] = None) -> None:
+    """Pin a MATLAB session to a slot and match its compute threads.
+
+    Args:
+        matlab_engine: The engine of the session.
+        slot: The CPU slot.
+        matlab_pid: The PID of the MATLAB process. Queried if `None`.
+    """
+    if matlab_pid is None:
+        matlab_pid = int(matlab_engine.feature("getpid"))
+    if hasattr(os, "sched_setaffinity"):
+        pin_process(matlab_pid, slot.cpus)
+    else:
+        logger.warning("CPU affinity is not supported on this platform.")
+    matlab_engine.maxNumCompThreads(float(slot.n_threads), nargout=0)
+    logger.info(f"MATLAB {matlab_pid} pinned to {slot} with {slot.n_threads} compute threads.")
+
+
+def _ray_assigned_cpus() -> int:
+    try:
+        import ray
+    except ImportError:
+        return 1
+    if not ray.is_initialized():
+        return 1
+    assigned = ray.get_runtime_context().get_assigned_resources()
+    return max(1, int(assigned.get("CPU", 1)))
+
+
+__all__ = [
+    "CpuSlot",
+    "CpuSlotPool",
+    "parse_slots",
+    "pin_process",
+    "apply_slot",
+]
@@ -1,8 +1,13 @@
-import matlab
-import matlab.engine
-from typing import Optional
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional
 import logging
 
+from .registry import exit_engine
+
+if TYPE_CHECKING:
+    import matlab.engine
+
 logger = logging.getLogger(__name__)
 
 _engine: Optional[matlab.engine.MatlabEngine] = None
@@ -23,6 +28,8 @@ def reserve_connection(session_name: Optional[str] = None) -> matlab.engine.Matl
     global _engine
     global _n_connection
 
+    import matlab.engine
+
     if session_name is None:
         logger.warn("No session name provided. If multiple MATLAB processes are running, "
                 "the connection may be to an unexpected session.")
@@ -49,5 +56,5 @@ def release_connection():
     elif _n_connection < 0:
         raise RuntimeError("Resource already released.")
     else:
-        _engine.exit()
+        exit_engine(_engine)
         _engine = None
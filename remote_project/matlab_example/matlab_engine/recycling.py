@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import logging
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import matlab.engine
+
+    from .affinity import CpuSlot
+
+logger = logging.getLogger(__name__)
+
+
+class RecyclingPolicy:
+    """When to replace a MATLAB engine.
+    Each criterion is disabled if `None`."""
+
+    def __init__(
+        self,
+        *,
+        max_simulations: Optional[int] = None,
+        max_rss_bytes: Optional[int] = None,
+        max_consecutive_errors: Optional[int] = None,
+        prewarm_ratio: float = 0.8,
+    ) -> None:
+        """Initialize a policy.
+
+        Args:
+            max_simulations: Restart after this many simulations.
+            max_rss_bytes: Restart when the resident memory of the MATLAB
+                process exceeds this size.
+            max_consecutive_errors: Restart after this many failed
+                simulations in a row.
+            prewarm_ratio: Start the replacement engine in the background
+                once a criterion reaches this ratio of its limit.
+        """
+        assert 0 < prewarm_ratio <= 1
+        self._max_simulations = max_simulations
+        self._max_rss_bytes = max_rss_bytes
+        self._max_consecutive_errors = max_consecutive_errors
+        self._prewarm_ratio = prewarm_ratio
+
+    def usage(self, n_simulations: int, rss_bytes: Optional[int], n_errors: int) -> float:
+        """Return the usage of the engine relative to the limits.
+        A value of 1.0 or more means the engine should be recycled."""
+        ratios = [0.0]
+        if self._max_simulations is not None:
+            ratios.append(n_simulations / self._max_simulations)
+        if self._max_rss_bytes is not None and rss_bytes is not None:
+            ratios.append(rss_bytes / self._max_rss_bytes)
+        if self._max_consecutive_errors is not None:
+            ratios.append(n_errors / self._max_consecutive_errors)
+        return max(ratios)
+
+    def should_recycle(self, n_simulations: int, rss_bytes: Optional[int], n_errors: int) -> bool:
+        return self.usage(n_simulations, rss_bytes, n_errors) >= 1.0
+
+    def should_prewarm(self, n_simulations: int, rss_bytes: Optional[int], n_errors: int) -> bool:
+        return self.usage(n_simulations, rss_bytes, n_errors) >= self._prewarm_ratio
+
+    @property
+    def watches_memory(self) -> bool:
+        return self._max_rss_bytes is not None
+
+    def __repr__(self) -> str:
+        return (
+            f"RecyclingPolicy(max_simulations={self._max_simulations}, "
+            f"max_rss_bytes={self._max_rss_bytes}, "
+            f"max_consecutive_errors={self._max_consecutive_errors})"
+        )
+
+
+class RecyclingEngine:
+    """A MATLAB engine started by this process that is replaced by a policy.
+
+    The replacement is started (and set up) in a background thread before
+    the current engine reaches its limits, so the swap does not pay for a
+    cold start. Models attached with `attach()` are rebound on each swap.
+
+    Only engines started by this class are recycled; shared sessions
+    reserved by `MatlabEngineManager` are left alone.
+    """
+
+    def __init__(
+        self,
+        policy: RecyclingPolicy,
+        *,
+        setup: Optional[Callable[[matlab.engine.MatlabEngine], None]] = None,
+        start_options: str = "-nodesktop",
+        cpu_slot: Optional[CpuSlot] = None,
+    ) -> None:
+        """Start an engine.
+
+        Args:
+            policy: The recycling policy.
+            setup: A function called on each new engine before use,
+                e.g. to `cd` and `addpath` the model directory.
+            start_options: Options passed to `matlab.engine.start_matlab`.
+            cpu_slot: A CPU slot each new engine is pinned to.
+        """
+        self._policy = policy
+        self._setup = setup
+        self._start_options = start_options
+        self._cpu_slot = cpu_slot
+        self._models: List = []
+        self._spare: Optional[Future] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matlab-prewarm")
+        self._engine = self._start()
+        self._n_recycled = 0
+        self._reset_counters()
+
+    @property
+    def engine(self) -> matlab.engine.MatlabEngine:
+        return self._engine
+
+    @property
+    def n_simulations(self) -> int:
+        return self._n_simulations
+
+    @property
+    def n_recycled(self) -> int:
+        return self._n_recycled
+
+    def attach(self, model) -> None:
+        """Bind a `SimulinkModel` to this engine and rebind it on each swap."""
+        model.bind(self._engine)
+        self._models.append(model)
+
+    def simulate(self, model, *args, **kwargs):
+        """Run `model.simulate(*args, **kwargs)` and record the outcome."""
+        try:
+            trace = model.simulate(*args, **kwargs)
+        except _failure_types():
+            self.record(success=False)
+            raise
+        self.record(success=True)
+        return trace
+
+    def record(self, success: bool) -> None:
+        """Record the outcome of a simulation and recycle the engine if needed."""
+        self._n_simulations += 1
+        self._n_errors = 0 if success else self._n_errors + 1
+        rss = self._rss() if self._policy.watches_memory else None
+        if self._policy.should_recycle(self._n_simulations, rss, self._n_errors):
+            self.recycle()
+        elif self._policy.should_prewarm(self._n_simulations, rss, self._n_errors):
+            if self._spare is None:
+                logger.info("Prewarming a replacement MATLAB engine.")
+                self._spare = self._executor.submit(self._start)
+        elif self._spare is not None:
+            # E.g. an error streak ended: do not keep an idle MATLAB process.
+            logger.info("Usage dropped below the prewarm threshold. Quitting the replacement MATLAB engine.")
+            self._discard_spare()
+
+    def recycle(self) -> None:
+        """Replace the engine now, using the prewarmed one if available."""
+        new_engine = self._take_spare()
+        if new_engine is None:
+            logger.info("No prewarmed MATLAB engine. Starting one synchronously.")
+            new_engine = self._start()
+        old_engine, self._engine = self._engine, new_engine
+        for model in self._models:
+            model.bind(self._engine)
+        self._quit(old_engine)
+        self._n_recycled += 1
+        logger.info(f"MATLAB engine recycled after {self._n_simulations} simulations.")
+        self._reset_counters()
+
+    def close(self) -> None:
+        """Exit the engine and the prewarmed one, if any."""
+        spare = self._take_spare()
+        if spare is not None:
+            self._quit(spare)
+        self._executor.shutdown(wait=True)
+        self._quit(self._engine)
+
+    def __enter__(self) -> RecyclingEngine:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _start(self) -> matlab.engine.MatlabEngine:
+        import matlab.engine
+
+        engine = matlab.engine.start_matlab(self._start_options)
+        if self._cpu_slot is not None:
+            from .affinity import apply_slot
+
+            apply_slot(engine, self._cpu_slot)
+        if self._setup is not None:
+            self._setup(engine)
+        return engine
+
+    def _take_spare(self) -> Optional[matlab.engine.MatlabEngine]:
+        """Wait for the prewarmed engine and hand it over, or return None if
+        there is none or its start failed."""
+        spare, self._spare = self._spare, None
+        if spare is None:
+            return None
+        try:
+            return spare.result()
+        except Exception as e:
+            logger.warning(f"Failed to start the replacement MATLAB engine: {e}")
+            return None
+
+    def _discard_spare(self) -> None:
+        spare, self._spare = self._spare, None
+
+        def quit_spare() -> None:
+            try:
+                engine = spare.result()
+            except Exception as e:
+                logger.warning(f"Failed to start the replacement MATLAB engine: {e}")
+                return
+            self._quit(engine)
+
+        # Queued after the start on the single prewarm thread, so this does not block.
+        self._executor.submit(quit_spare)
+
+    def _reset_counters(self) -> None:
+        self._n_simulations = 0
+        self._n_errors = 0
+
+    def _rss(self) -> Optional[int]:
+        try:
+            return process_rss(int(self._engine.feature("getpid")))
+        except Exception as e:
+            logger.warning(f"Failed to get the memory usage of MATLAB: {e}")
+            return None
+
+    @staticmethod
+    def _quit(engine: matlab.engine.MatlabEngine) -> None:
+        from .registry import exit_engine
+
+        exit_engine(engine)
+
+
+def _failure_types() -> Tuple[type, ...]:
+    # MATLAB engine errors do not all derive from RuntimeError. The engine
+    # module is loaded once an engine is started; do not import it here.
+    engine = sys.modules.get("matlab.engine")
+    if engine is None:
+        return (RuntimeError,)
+    return (RuntimeError, engine.MatlabExecutionError, engine.RejectedExecutionError, engine.EngineError)
+
+
+def process_rss(pid: int) -> Optional[int]:
+    """Return the resident set size of a process in bytes.
+    Returns `None` if it cannot be read (e.g., not on Linux)."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+__all__ = [
+    "RecyclingPolicy",
+    "RecyclingEngine",
+    "process_rss",
+]
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+from .recycling import process_rss
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """The Simulink models loaded in one MATLAB engine.
+
+    Each model is loaded once with `load_system`, and its `simget` options
+    are cached and shared by every `SimulinkModel` of that name bound to the
+    engine. Least recently used models are closed with `close_system` when
+    more than `max_models` are loaded or the MATLAB process exceeds
+    `max_rss_bytes`; they are loaded again on their next use.
+
+    The registry only holds a weak reference to its engine, so that it
+    does not keep an exited engine alive.
+
+    With `fast_restart`, models are kept compiled between simulations.
+    Fast restart forbids changing compile-time settings such as the solver
+    tolerances of `simulator.Fidelity`, so enable it only for models
+    simulated at one fidelity.
+    """
+
+    def __init__(
+        self,
+        matlab_engine: Any,
+        *,
+        max_models: Optional[int] = None,
+        max_rss_bytes: Optional[int] = None,
+        fast_restart: bool = False,
+    ) -> None:
+        """Initialize an empty registry.
+
+        Args:
+            matlab_engine: The MATLAB engine.
+            max_models: The maximum number of loaded models. Unlimited if `None`.
+            max_rss_bytes: The resident memory of the MATLAB process above
+                which models are closed. Unlimited if `None`.
+            fast_restart: Whether to turn on fast restart on loaded models.
+        """
+        assert max_models is None or max_models > 0
+        self._engine_ref = weakref.ref(matlab_engine)
+        self._max_models = max_models
+        self._max_rss_bytes = max_rss_bytes
+        self._fast_restart = fast_restart
+        self._models: OrderedDict[str, Any] = OrderedDict()
+        self._pid: Optional[int] = None
+        self._lock = threading.RLock()
+        self._n_loads = 0
+
+    @property
+    def engine(self) -> Any:
+        engine = self._engine_ref()
+        if engine is None:
+            raise RuntimeError("The MATLAB engine of the model registry no longer exists.")
+        return engine
+
+    @property
+    def loaded(self) -> List[str]:
+        """The names of the loaded models, least recently used first."""
+        return list(self._models)
+
+    @property
+    def n_loads(self) -> int:
+        return self._n_loads
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._models
+
+    def acquire(self, name: str) -> Any:
+        """Return the simulation options of a model, loading it if needed.
+
+        Args:
+            name: The name of the model. It must be on the MATLAB path.
+
+        Returns:
+            The options struct returned by `simget`.
+        """
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+            logger.info(f"Loading model {name}.")
+            engine = self.engine
+            engine.load_system(name, nargout=0)
+            if self._fast_restart:
+                engine.set_param(name, "FastRestart", "on", nargout=0)
+            opts = self._models[name] = engine.simget(name)
+            self._n_loads += 1
+            self._enforce_budget()
+            return opts
+
+    def close(self, name: str) -> None:
+        """Close a model without saving it.
+
+        Args:
+            name: The name of the model.
+        """
+        with self._lock:
+            if name not in self._models:
+                return
+            del self._models[name]
+            logger.info(f"Closing model {name}.")
+            try:
+                engine = self.engine
+                if self._fast_restart:
+                    engine.set_param(name, "FastRestart", "off", nargout=0)
+                engine.close_system(name, 0, nargout=0)
+            except Exception as e:
+                logger.warning(f"Failed to close model {name}: {e}")
+
+    def close_all(self) -> None:
+        """Close all the models loaded through the registry."""
+        with self._lock:
+            for name in list(self._models):
+                self.close(name)
+
+    def _enforce_budget(self) -> None:
+        # The most recently used model is never closed.
+        while self._max_models is not None and len(self._models) > self._max_models:
+            self.close(next(iter(self._models)))
+        if self._max_rss_bytes is None:
+            return
+        rss = self._rss()
+        while len(self._models) > 1 and rss is not None and rss > self._max_rss_bytes:
+            logger.info(f"MATLAB uses {rss} bytes, above {self._max_rss_bytes}.")
+            self.close(next(iter(self._models)))
+            previous, rss = rss, self._rss()
+            # MATLAB often keeps the memory of closed models. Closing more
+            # models would then only make them reload on their next use.
+            if rss is not None and rss >= previous:
+                logger.info("Closing a model did not reduce the memory usage of MATLAB.")
+                break
+
+    def _rss(self) -> Optional[int]:
+        try:
+            if self._pid is None:
+                self._pid = int(self.engine.feature("getpid"))
+            return process_rss(self._pid)
+        except Exception as e:
+            logger.warning(f"Failed to get the memory usage of MATLAB: {e}")
+            return None
+
+
+# Entries go away with their engine, whichever way it exits.
+_registries: "weakref.WeakKeyDictionary[Any, ModelRegistry]" = weakref.WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(matlab_engine: Any, **options: Any) -> ModelRegistry:
+    """Return the model registry of an engine, creating it on first use.
+
+    Args:
+        matlab_engine: The MATLAB engine.
+        options: Keyword arguments of `ModelRegistry`, applied when the
+            registry is created. Call this before creating models to set a budget.
+
+    Returns:
+        The registry shared by all models bound to the engine.
+    """
+    with _registries_lock:
+        registry = _registries.get(matlab_engine)
+        if registry is not None:
+            if options:
+                logger.warning("The model registry already exists. Ignoring the options.")
+            return registry
+        registry = _registries[matlab_engine] = ModelRegistry(matlab_engine, **options)
+        return registry
+
+
+def drop_model_registry(matlab_engine: Any) -> None:
+    """Forget the registry of an engine, e.g. before the engine exits.
+    The models are not closed."""
+    with _registries_lock:
+        _registries.pop(matlab_engine, None)
+
+
+def exit_engine(matlab_engine: Any) -> None:
+    """Exit an engine and forget everything bound to it: its model registry
+    and the models of `ModelSpec.bind`. Failures to exit are logged.
+
+    Args:
+        matlab_engine: The MATLAB engine.
+    """
+    from ..spec import clear_bound_models
+
+    drop_model_registry(matlab_engine)
+    clear_bound_models(matlab_engine)
+    try:
+        matlab_engine.exit()
+    except Exception as e:
+        logger.warning(f"Failed to exit MATLAB engine: {e}")
+
+
+__all__ = [
+    "ModelRegistry",
+    "get_model_registry",
+    "drop_model_registry",
+    "exit_engine",
+]
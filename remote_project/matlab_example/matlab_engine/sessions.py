@@ -1,16 +1,22 @@
+from __future__ import annotations
+
 import logging
-from typing import List, Union, Optional
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, List, Union, Optional
 import os
 
-import matlab.engine
 from . import context
 from .global_engine import has_no_engine_connection
 
+if TYPE_CHECKING:
+    from .affinity import CpuSlot, CpuSlotPool
+
 logger = logging.getLogger(__name__)
 
 
 def find_matlab() -> List[str]:
     """Find all local MATLAB sessions."""
+    import matlab.engine
 
     return matlab.engine.find_matlab()
 
@@ -25,10 +31,18 @@ class MatlabEngineManager:
     that proxies connection to an MATLAB session. A session is a MATLAB process itself.
 
     Do not multiplly instantiate this class in the same python process.
+
+    If a CPU slot pool is given, the reserved session is pinned to a slot of
+    the pool and its compute threads are limited to the slot size, so that
+    the sessions of a node do not oversubscribe its cores.
     """
-    def __init__(self, pid_dir: Union[str, os.PathLike]) -> None:
+    def __init__(
+        self, pid_dir: Union[str, os.PathLike], *, cpu_slots: Optional[CpuSlotPool] = None
+    ) -> None:
         self._pid_dir = pid_dir
         self._matlab_name = None
+        self._cpu_slots = cpu_slots
+        self._cpu_slot: Optional[CpuSlot] = None
         if not os.path.isdir(self._pid_dir):
             raise ValueError(f"Path {self._pid_dir} does not exist or is not a directory.")
 
@@ -63,11 +77,23 @@ class MatlabEngineManager:
             matlab_name = self.get_available_matlab()
         reserve_matlab(matlab_name, self._pid_dir)
         self._matlab_name = matlab_name
+        if self._cpu_slots is not None:
+            self._cpu_slot = self._cpu_slots.reserve(matlab_pid=_session_pid(matlab_name))
 
     def connection(self):
         """Get a connection to the MATLAB engine that handles the session
          reserved by this manager."""
-        return context.connection(self._matlab_name)
+        if self._cpu_slot is None:
+            return context.connection(self._matlab_name)
+        return self._pinned_connection()
+
+    @contextmanager
+    def _pinned_connection(self):
+        from .affinity import apply_slot
+
+        with context.connection(self._matlab_name) as engine:
+            apply_slot(engine, self._cpu_slot, _session_pid(self._matlab_name))
+            yield engine
 
     def release(self) -> None:
         """Release the MATLAB session reserved by this manager."""
@@ -80,6 +106,9 @@ class MatlabEngineManager:
             
         release_matlab(self._matlab_name, self._pid_dir)
         self._matlab_name = None
+        if self._cpu_slot is not None:
+            self._cpu_slots.release(self._cpu_slot)
+            self._cpu_slot = None
 
     def __del__(self) -> None:
         self.release()
@@ -89,6 +118,15 @@ class MatlabEngineManager:
         """Name of the MATLAB session reserved by this manager."""
         return self._matlab_name
 
+    @property
+    def cpu_slot(self) -> Optional[CpuSlot]:
+        """CPU slot of the MATLAB session reserved by this manager."""
+        return self._cpu_slot
+
+
+def _session_pid(matlab_name: str) -> int:
+    return int(matlab_name.split("_")[-1])
+
 
 def reserve_matlab(matlab_name: str, pid_dir: Union[str, os.PathLike]) -> None:
     """Reserve a MATLAB session by PID file.
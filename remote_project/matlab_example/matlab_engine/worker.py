@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import atexit
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set
+
+from .registry import exit_engine
+
+if TYPE_CHECKING:
+    import matlab.engine
+
+    from .affinity import CpuSlot, CpuSlotPool
+
+logger = logging.getLogger(__name__)
+
+
+class MatlabWorker:
+    """A MATLAB engine that serves calls, intended to be hosted in a Ray actor.
+
+    Run one actor per MATLAB process a node can host, with the `matlab`
+    resource and the CPUs of a slot (see `create_worker_actors`). An actor
+    holds its resources while it lives and its engine lives no longer than
+    the actor, so the `matlab` resources in use match the running MATLAB
+    processes, and a slot is only held by a live engine. Calls sent to the
+    actor share the engine, so `ModelSpec.bind` reuses the loaded models.
+
+    The engine is started on the first call. After a transient error (see
+    `faults.is_transient_error`) it is exited and its slot released, and the
+    next call starts a new one.
+    """
+
+    def __init__(
+        self,
+        setup: Optional[Callable[[matlab.engine.MatlabEngine], None]] = None,
+        *,
+        cpu_slots: Optional[Callable[[], CpuSlotPool]] = None,
+        start_options: str = "-nodesktop",
+    ) -> None:
+        """Initialize a worker.
+
+        Args:
+            setup: A function called once on each new engine, e.g. to `cd` and
+                `addpath` the model directory.
+            cpu_slots: A function returning the pool to reserve a CPU slot from
+                and pin each engine to, e.g. `lambda: CpuSlotPool.from_ray(path)`.
+                It is called in the process hosting the worker.
+            start_options: Options passed to `matlab.engine.start_matlab`.
+        """
+        self._setup = setup
+        self._pool = cpu_slots() if cpu_slots is not None else None
+        self._start_options = start_options
+        self._engine: Optional[matlab.engine.MatlabEngine] = None
+        self._slot: Optional[CpuSlot] = None
+        self._n_started = 0
+
+    @property
+    def engine(self) -> matlab.engine.MatlabEngine:
+        """The engine, started if needed."""
+        if self._engine is None:
+            self._start()
+        return self._engine
+
+    @property
+    def n_started(self) -> int:
+        return self._n_started
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Return `fn(engine, *args, **kwargs)`.
+
+        Example:
+            >>> def simulate(engine, spec, x, objective):
+            ...     return evaluate(spec.bind(engine), [spec.to_valuation(x)], objective)[0]
+            >>> ref = actor.call.remote(simulate, spec_ref, x, objective)
+        """
+        from ..faults import is_transient_error
+
+        engine = self.engine
+        try:
+            return fn(engine, *args, **kwargs)
+        except Exception as e:
+            if is_transient_error(e):
+                logger.warning(f"Transient MATLAB error ({e}). Exiting the engine.")
+                self.close()
+            raise
+
+    def close(self) -> None:
+        """Exit the engine, if any, and release its CPU slot."""
+        if self._engine is not None:
+            engine, self._engine = self._engine, None
+            exit_engine(engine)
+            atexit.unregister(self.close)
+        self._release_slot()
+
+    def _start(self) -> None:
+        import matlab.engine
+
+        # The slot is reserved before MATLAB starts, so a full node fails fast.
+        self._slot = self._pool.reserve() if self._pool is not None else None
+        engine = None
+        try:
+            engine = matlab.engine.start_matlab(self._start_options)
+            if self._slot is not None:
+                from .affinity import apply_slot
+
+                matlab_pid = int(engine.feature("getpid"))
+                self._pool.update(self._slot, matlab_pid)
+                apply_slot(engine, self._slot, matlab_pid)
+            if self._setup is not None:
+                self._setup(engine)
+        except BaseException:
+            if engine is not None:
+                exit_engine(engine)
+            self._release_slot()
+            raise
+        self._engine = engine
+        self._n_started += 1
+        atexit.register(self.close)
+        logger.info(f"Started MATLAB engine {self._n_started} of this worker.")
+
+    def _release_slot(self) -> None:
+        if self._slot is not None:
+            self._pool.release(self._slot)
+            self._slot = None
+
+
+class WorkerPool:
+    """Send calls to `MatlabWorker` actors, each to the one with the fewest
+    pending calls. Usable as the `submit` of a `StreamingExecutor`:
+
+        pool = WorkerPool(create_worker_actors(4, setup))
+        executor = StreamingExecutor(lambda x: pool.submit(simulate, spec_ref, x), max_in_flight=4)
+    """
+
+    def __init__(self, actors: List[Any]) -> None:
+        assert len(actors) > 0
+        self._actors = list(actors)
+        self._pending: Dict[int, Set[Any]] = {i: set() for i in range(len(actors))}
+
+    @property
+    def actors(self) -> List[Any]:
+        return self._actors
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call `fn(engine, *args, **kwargs)` on the least busy actor.
+
+        Returns:
+            The object reference of the result.
+        """
+        import ray
+
+        pending = [ref for refs in self._pending.values() for ref in refs]
+        if pending:
+            done, _ = ray.wait(pending, num_returns=len(pending), timeout=0)
+            for refs in self._pending.values():
+                refs.difference_update(done)
+        i = min(self._pending, key=lambda j: len(self._pending[j]))
+        ref = self._actors[i].call.remote(fn, *args, **kwargs)
+        self._pending[i].add(ref)
+        return ref
+
+
+def create_worker_actors(
+    n: int,
+    setup: Optional[Callable[[matlab.engine.MatlabEngine], None]] = None,
+    *,
+    actor_options: Optional[dict] = None,
+    **kwargs,
+) -> List[Any]:
+    """Start Ray actors that each host a `MatlabWorker`.
+
+    Args:
+        n: The number of actors, e.g. the total `matlab` resource of the cluster.
+        setup: A function called once on each new engine.
+        actor_options: Options passed to `ray.remote(...).options()`. Defaults to
+            one `matlab` resource and one CPU per actor.
+        kwargs: Keyword arguments of `MatlabWorker`.
+
+    Returns:
+        The handles of the actors.
+    """
+    import ray
+
+    options = {"num_cpus": 1, "resources": {"matlab": 1}, **(actor_options or {})}
+    actor_cls = ray.remote(MatlabWorker)
+    return [actor_cls.options(**options).remote(setup, **kwargs) for _ in range(n)]
+
+
+__all__ = [
+    "MatlabWorker",
+    "WorkerPool",
+    "create_worker_actors",
+]
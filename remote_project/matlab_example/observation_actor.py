@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from .core import ObservationStore
+
+logger = logging.getLogger(__name__)
+
+
+class ObservationStoreActor:
+    """An `ObservationStore` shared by several search processes.
+
+    This class is intended to be hosted in a Ray actor (see
+    `create_observation_store_actor`). Workers register batches, query the
+    best points, and read snapshots of all observations. A snapshot is put in
+    the object store once per version, so any number of readers share one
+    immutable copy. Subscribers are notified of each improvement of the
+    best-so-far, so parallel restarts can prune their own search.
+    """
+
+    def __init__(self, names: List[str]) -> None:
+        self._store = ObservationStore(names)
+        self._version = 0
+        self._snapshot: Optional[Tuple[int, Any]] = None
+        self._subscribers: List[Tuple[Any, str]] = []
+
+    def register(self, x: np.ndarray, fx: np.ndarray, fidelity: int = 0) -> bool:
+        """Register a batch of observations.
+
+        Returns:
+            True if the batch improved the best-so-far.
+        """
+        best = self._store.min
+        self._store.register(x, fx, fidelity)
+        self._version += 1
+        improved = self._store.min < best
+        if improved:
+            self._broadcast()
+        return improved
+
+    def register_many(self, batches: List[Tuple[np.ndarray, np.ndarray, int]]) -> bool:
+        """Register several `(x, fx, fidelity)` batches at once to save round trips.
+
+        Returns:
+            True if the batches improved the best-so-far.
+        """
+        best = self._store.min
+        for x, fx, fidelity in batches:
+            self._store.register(x, fx, fidelity)
+        self._version += 1
+        improved = self._store.min < best
+        if improved:
+            self._broadcast()
+        return improved
+
+    def min(self) -> float:
+        return self._store.min
+
+    def min_x(self) -> Optional[np.ndarray]:
+        return self._store.min_x
+
+    def top_k(self, k: int, objective: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        return self._store.top_k(k, objective)
+
+    def pareto_front(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self._store.pareto_front()
+
+    def num(self) -> int:
+        return self._store.num
+
+    def version(self) -> int:
+        """The number of register calls so far. Changes whenever the data does."""
+        return self._version
+
+    def snapshot_ref(self) -> List[Any]:
+        """Return the object reference of a `(version, X, fX)` snapshot.
+        The reference is wrapped in a list so Ray does not resolve it in
+        transit; readers get it with `ray.get(ref)` without a copy per reader.
+        """
+        import ray
+
+        if self._snapshot is None or self._snapshot[0] != self._version:
+            self._snapshot = (
+                self._version,
+                ray.put((self._version, self._store.X, self._store.fX)),
+            )
+        return [self._snapshot[1]]
+
+    def subscribe(self, handle: Any, method: str = "on_improvement") -> None:
+        """Call `handle.<method>.remote(min_x, min)` on each improvement.
+
+        Args:
+            handle: A Ray actor handle.
+            method: The name of the method to call.
+        """
+        self._subscribers.append((handle, method))
+
+    def _broadcast(self) -> None:
+        x, fx = self._store.min_x, self._store.min
+        logger.info(f"New best {fx}. Notifying {len(self._subscribers)} subscribers.")
+        for handle, method in self._subscribers:
+            getattr(handle, method).remote(x, fx)
+
+
+def create_observation_store_actor(
+    names: List[str],
+    *,
+    actor_options: Optional[dict] = None,
+):
+    """Start a Ray actor hosting a shared observation store.
+
+    Args:
+        names: The names of the parameters.
+        actor_options: Options passed to `ray.remote(...).options()`,
+            e.g. `{"name": "observations", "lifetime": "detached"}`.
+
+    Returns:
+        A handle of the actor.
+    """
+    import ray
+
+    actor_cls = ray.remote(ObservationStoreActor)
+    return actor_cls.options(**(actor_options or {})).remote(names)
+
+
+def get_snapshot(handle: Any) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Read the latest snapshot of a shared store.
+
+    Args:
+        handle: The handle of an `ObservationStoreActor`.
+
+    Returns:
+        The version, `X` and `fX`. The arrays are read-only views of the
+        object store.
+    """
+    import ray
+
+    [ref] = ray.get(handle.snapshot_ref.remote())
+    return ray.get(ref)
+
+
+__all__ = [
+    "ObservationStoreActor",
+    "create_observation_store_actor",
+    "get_snapshot",
+]
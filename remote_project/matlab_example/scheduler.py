@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import heapq
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .executor import StreamingExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class SimulationJob:
+    """A unit of work for the scheduler: one simulation of a model."""
+
+    def __init__(
+        self,
+        model_name: str,
+        time_horizon: float,
+        time_step: float,
+        payload: Any = None,
+    ) -> None:
+        """Initialize a job.
+
+        Args:
+            model_name: The name of the Simulink model.
+            time_horizon: The time horizon of the simulation.
+            time_step: The input time step of the simulation.
+            payload: Anything needed to run the job, e.g. a valuation.
+        """
+        assert time_step > 0
+        self._model_name = model_name
+        self._time_horizon = time_horizon
+        self._time_step = time_step
+        self._payload = payload
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    @property
+    def time_horizon(self) -> float:
+        return self._time_horizon
+
+    @property
+    def time_step(self) -> float:
+        return self._time_step
+
+    @property
+    def payload(self) -> Any:
+        return self._payload
+
+    @property
+    def n_steps(self) -> float:
+        return self._time_horizon / self._time_step
+
+    def __repr__(self) -> str:
+        return (
+            f"SimulationJob(model_name={self._model_name}, "
+            f"time_horizon={self._time_horizon}, time_step={self._time_step})"
+        )
+
+
+class _LinearFit:
+    """Online least squares fit of `y = a + b * x`."""
+
+    def __init__(self) -> None:
+        self.n = 0
+        self._sx = 0.0
+        self._sy = 0.0
+        self._sxx = 0.0
+        self._sxy = 0.0
+
+    def add(self, x: float, y: float) -> None:
+        self.n += 1
+        self._sx += x
+        self._sy += y
+        self._sxx += x * x
+        self._sxy += x * y
+
+    def coefficients(self, prior_overhead: float) -> Optional[Tuple[float, float]]:
+        """Return `(a, b)`, or None without observations. If all observations
+        have the same `x`, `a` cannot be identified and `prior_overhead` is
+        used instead (at most the mean of `y`), with `b` fitting the mean."""
+        if self.n == 0:
+            return None
+        mean_x, mean_y = self._sx / self.n, self._sy / self.n
+        var_x = self._sxx / self.n - mean_x**2
+        if self.n < 2 or var_x <= 1e-12 * max(1.0, mean_x**2):
+            overhead = min(prior_overhead, mean_y)
+            return overhead, (mean_y - overhead) / mean_x if mean_x > 0 else 0.0
+        slope = max(0.0, (self._sxy / self.n - mean_x * mean_y) / var_x)
+        return max(0.0, mean_y - slope * mean_x), slope
+
+
+class RuntimeModel:
+    """A runtime model learned from observed simulations.
+
+    The runtime of a job is modeled as `overhead + cost * n_steps`, where
+    `n_steps = time_horizon / time_step`, fitted per model and step size.
+    Unseen step sizes fall back to the fit of the model, and unseen models
+    to the prior. Until a model has been observed with different `n_steps`,
+    its overhead is taken from the prior.
+    """
+
+    def __init__(self, *, prior_overhead: float = 1.0, prior_cost_per_step: float = 1e-3) -> None:
+        """Initialize a runtime model.
+
+        Args:
+            prior_overhead: The per-call overhead assumed before any observation, in seconds.
+            prior_cost_per_step: The per-step cost assumed before any observation, in seconds.
+        """
+        self._prior = (prior_overhead, prior_cost_per_step)
+        self._fits: Dict[Tuple[str, float], _LinearFit] = {}
+        self._model_fits: Dict[str, _LinearFit] = {}
+
+    def observe(self, job: SimulationJob, seconds: float) -> None:
+        """Record the measured runtime of a job."""
+        key = (job.model_name, job.time_step)
+        self._fits.setdefault(key, _LinearFit()).add(job.n_steps, seconds)
+        self._model_fits.setdefault(job.model_name, _LinearFit()).add(job.n_steps, seconds)
+
+    def predict(self, job: SimulationJob) -> float:
+        """Predict the runtime of a job in seconds."""
+        for fit in (self._fits.get((job.model_name, job.time_step)), self._model_fits.get(job.model_name)):
+            if fit is not None:
+                coefficients = fit.coefficients(self._prior[0])
+                if coefficients is not None:
+                    overhead, cost = coefficients
+                    return overhead + cost * job.n_steps
+        return self._prior[0] + self._prior[1] * job.n_steps
+
+    @property
+    def overhead(self) -> float:
+        """The mean fitted per-call overhead in seconds."""
+        fits = (f.coefficients(self._prior[0]) for f in self._model_fits.values())
+        overheads = [c[0] for c in fits if c is not None]
+        return sum(overheads) / len(overheads) if overheads else self._prior[0]
+
+
+class CostModelScheduler:
+    """Order and batch heterogeneous simulation jobs by predicted runtime.
+
+    Long jobs are dispatched first (longest processing time first), which
+    bounds the makespan when workers pull jobs as they free up. Short jobs
+    are grouped into batches of at least `min_batch_seconds` so the per-task
+    overhead (Ray dispatch, engine calls) is amortized.
+
+    `run` dispatches the batches with a `StreamingExecutor` and feeds the
+    measured runtimes back into the runtime model, so each call schedules
+    with what the previous ones learned.
+    """
+
+    def __init__(
+        self,
+        runtime_model: Optional[RuntimeModel] = None,
+        *,
+        min_batch_seconds: Optional[float] = None,
+        max_batch_size: int = 64,
+    ) -> None:
+        """Initialize a scheduler.
+
+        Args:
+            runtime_model: The runtime model. A new one is created if `None`.
+            min_batch_seconds: The target runtime of a batch of short jobs.
+                Defaults to ten times the learned per-call overhead.
+            max_batch_size: The maximum number of jobs in a batch.
+        """
+        self._runtime_model = runtime_model if runtime_model is not None else RuntimeModel()
+        self._min_batch_seconds = min_batch_seconds
+        self._max_batch_size = max_batch_size
+
+    @property
+    def runtime_model(self) -> RuntimeModel:
+        return self._runtime_model
+
+    def observe(self, job: SimulationJob, seconds: float) -> None:
+        self._runtime_model.observe(job, seconds)
+
+    def batches(self, jobs: Sequence[SimulationJob]) -> List[List[SimulationJob]]:
+        """Group jobs into batches ordered by decreasing predicted runtime.
+        Each batch is run by a single task on a single engine.
+
+        Args:
+            jobs: The jobs to schedule.
+
+        Returns:
+            The batches, longest first.
+        """
+        target = self._min_batch_seconds
+        if target is None:
+            target = 10 * self._runtime_model.overhead
+        predicted = sorted(
+            ((self._runtime_model.predict(job), i) for i, job in enumerate(jobs)), reverse=True
+        )
+
+        batches: List[Tuple[float, List[SimulationJob]]] = []
+        # Short jobs of the same model share a batch to reuse the loaded model.
+        short_jobs: Dict[str, List[Tuple[float, SimulationJob]]] = {}
+        for seconds, i in predicted:
+            if seconds >= target:
+                batches.append((seconds, [jobs[i]]))
+            else:
+                short_jobs.setdefault(jobs[i].model_name, []).append((seconds, jobs[i]))
+        for model_jobs in short_jobs.values():
+            current: List[SimulationJob] = []
+            current_seconds = 0.0
+            for seconds, job in model_jobs:
+                current.append(job)
+                current_seconds += seconds
+                if current_seconds >= target or len(current) >= self._max_batch_size:
+                    batches.append((current_seconds, current))
+                    current, current_seconds = [], 0.0
+            if current:
+                batches.append((current_seconds, current))
+
+        batches.sort(key=lambda b: b[0], reverse=True)
+        logger.debug(f"Scheduled {len(jobs)} jobs in {len(batches)} batches.")
+        return [batch for _, batch in batches]
+
+    def run(
+        self,
+        jobs: Sequence[SimulationJob],
+        submit: Callable[[List[Any]], Any],
+        *,
+        max_in_flight: int = 8,
+    ) -> Iterator[Tuple[SimulationJob, Any]]:
+        """Run jobs as Ray tasks, one per batch, longest first.
+
+        The runtime of each result with an `elapsed` attribute, such as an
+        `evaluation.Evaluation`, is observed by the runtime model, e.g.
+
+            @ray.remote(resources={"matlab": 1})
+            def simulate_batch(spec, xs, objective):
+                model = spec.bind(engine)
+                return evaluate(model, [spec.to_valuation(x) for x in xs], objective)
+
+            jobs = [SimulationJob(spec.name, horizon, spec.time_step, x) for x, horizon in inputs]
+            for job, evaluation in scheduler.run(jobs, lambda xs: simulate_batch.remote(spec_ref, xs, objective)):
+                ...
+
+        Args:
+            jobs: The jobs to run.
+            submit: A function submitting the task of a batch, given the
+                payloads of its jobs, and returning its object reference.
+                The task returns one result per payload, in order.
+            max_in_flight: The maximum number of pending tasks.
+
+        Yields:
+            Each job and its result, in the completion order of the batches.
+        """
+        executor = StreamingExecutor(
+            lambda batch: submit([job.payload for job in batch]), max_in_flight=max_in_flight
+        )
+        for batch, results in executor.map_unordered(self.batches(jobs)):
+            if len(results) != len(batch):
+                raise RuntimeError(f"A batch of {len(batch)} jobs returned {len(results)} results.")
+            for job, result in zip(batch, results):
+                elapsed = getattr(result, "elapsed", None)
+                if elapsed is not None:
+                    self.observe(job, elapsed)
+                yield job, result
+
+    def pack(self, jobs: Sequence[SimulationJob], n_engines: int) -> List[List[List[SimulationJob]]]:
+        """Assign batches to engines, longest first to the least loaded engine.
+        Use this when each engine (e.g., an actor) is fed its own queue.
+
+        Args:
+            jobs: The jobs to schedule.
+            n_engines: The number of engines.
+
+        Returns:
+            For each engine, its batches in execution order.
+        """
+        assert n_engines > 0
+        queues: List[List[List[SimulationJob]]] = [[] for _ in range(n_engines)]
+        loads = [(0.0, i) for i in range(n_engines)]
+        for batch in self.batches(jobs):
+            load, i = heapq.heappop(loads)
+            queues[i].append(batch)
+            heapq.heappush(loads, (load + sum(self._runtime_model.predict(j) for j in batch), i))
+        return queues
+
+
+__all__ = [
+    "SimulationJob",
+    "RuntimeModel",
+    "CostModelScheduler",
+]
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import itertools
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .core import Valuation
+from .simulator import SimulinkModel, Trace, slice_input
+
+logger = logging.getLogger(__name__)
+
+_ids = itertools.count()
+
+
+class OnlineMonitor:
+    """An abstract monitor evaluated on prefixes of a trace."""
+
+    def bounds(self, trace: Trace) -> Tuple[float, float]:
+        """Bound the robustness of the complete trace given a prefix of it.
+
+        Args:
+            trace: A prefix of the trace.
+
+        Returns:
+            The lower and upper bounds.
+        """
+        raise NotImplementedError()
+
+
+def simulate_segmented(
+    model: SimulinkModel,
+    valuation: Valuation,
+    monitor: OnlineMonitor,
+    *,
+    segment_length: float,
+    threshold: float = 0.0,
+    time_horizon: Optional[float] = None,
+) -> Trace:
+    """Simulate the model segment by segment and stop once the verdict is settled.
+
+    After each segment the monitor bounds the robustness of the whole run
+    from the partial trace. The simulation stops when the upper bound is
+    below `threshold` (falsified) or the lower bound is at least `threshold`
+    (satisfied), and resumes from the saved operating point otherwise.
+    Any object with a compatible `bounds` method, such as
+    `evaluation.ThresholdObjective`, can be used as a monitor.
+
+    Args:
+        model: The model to simulate.
+        valuation: A valuation of the parameters of the model.
+        monitor: The online monitor.
+        segment_length: The simulated time between two monitor evaluations.
+        threshold: The robustness threshold of the verdict.
+        time_horizon: The time horizon of the simulation.
+
+    Returns:
+        The simulation result, flagged `truncated` if stopped early.
+    """
+    assert segment_length > 0
+    if time_horizon is None:
+        time_horizon = model.time_horizon
+    model_input = model.build_input(valuation, time_horizon)
+    n_segments = int(np.ceil(time_horizon / segment_length - 1e-9))
+    boundaries = [min(i * segment_length, time_horizon) for i in range(n_segments + 1)]
+
+    # Alternate between two workspace variables for the operating point.
+    run_id = next(_ids)
+    states = [f"seg_{run_id}_a", f"seg_{run_id}_b"]
+    parts = []
+    state: Optional[str] = None
+    try:
+        for i, (start, end) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+            is_last = i == n_segments - 1
+            final_state = None if is_last else states[i % 2]
+            parts.append(
+                model.simulate_segment(
+                    start,
+                    end,
+                    slice_input(model_input, start, end),
+                    initial_state=state,
+                    final_state=final_state,
+                )
+            )
+            state = final_state
+            if is_last:
+                break
+            lower, upper = monitor.bounds(Trace.concatenate(parts))
+            if upper < threshold or lower >= threshold:
+                logger.debug(f"Verdict settled at t={end} of {time_horizon}. Stopping early.")
+                trace = Trace.concatenate(parts)
+                return Trace(
+                    trace.time_steps,
+                    [trace[v] for v in trace.variables],
+                    trace.variables,
+                    truncated=True,
+                )
+    finally:
+        model.clear_variables(*states)
+    return Trace.concatenate(parts)
+
+
+__all__ = [
+    "OnlineMonitor",
+    "simulate_segmented",
+]
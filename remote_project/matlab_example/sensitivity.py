@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .core import RangeParameter, Valuation
+from .evaluation import Objective, evaluate
+from .executor import StreamingExecutor
+from .simulator import SimulinkModel
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BatchEvaluator = Callable[[List[Valuation]], Sequence[float]]
+
+
+def saltelli_design(
+    n: int, dim: int, rng: Optional[np.random.Generator] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Build the matrices of a Saltelli design in the unit cube.
+
+    `A` and `B` are two independent samples, and `AB[i]` is `A` with its
+    column `i` taken from `B`. The design needs `n * (dim + 2)` evaluations.
+    A scrambled Sobol sequence is used if scipy is installed (`n` should then
+    be a power of two), otherwise uniform random samples.
+
+    Args:
+        n: The number of base samples.
+        dim: The number of parameters.
+        rng: A numpy random generator.
+
+    Returns:
+        `A` and `B` of shape (n, dim), and `AB` of shape (dim, n, dim).
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        qmc = None
+    if qmc is not None:
+        sample = qmc.Sobol(2 * dim, scramble=True, seed=rng).random(n)
+    else:
+        sample = rng.uniform(size=(n, 2 * dim))
+    A, B = sample[:, :dim], sample[:, dim:]
+    AB = np.repeat(A[None, :, :], dim, axis=0)
+    idx = np.arange(dim)
+    AB[idx, :, idx] = B.T
+    return A, B, AB
+
+
+def sobol_indices(
+    fA: np.ndarray, fB: np.ndarray, fAB: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Estimate first-order (Saltelli 2010) and total-order (Jansen) Sobol indices.
+
+    The inputs may have leading batch dimensions, e.g. bootstrap resamples.
+
+    Args:
+        fA: The outputs on `A`, shape (..., n).
+        fB: The outputs on `B`, shape (..., n).
+        fAB: The outputs on `AB`, shape (dim, ..., n).
+
+    Returns:
+        The first-order and total-order indices, each of shape (dim, ...).
+    """
+    variance = np.var(np.concatenate([fA, fB], axis=-1), axis=-1)
+    first = np.mean(fB * (fAB - fA), axis=-1) / variance
+    total = 0.5 * np.mean((fA - fAB) ** 2, axis=-1) / variance
+    return first, total
+
+
+class SensitivityResult:
+    """Sobol indices of the parameters with bootstrap confidence intervals."""
+
+    def __init__(
+        self,
+        names: List[str],
+        first_order: np.ndarray,
+        total_order: np.ndarray,
+        first_order_ci: np.ndarray,
+        total_order_ci: np.ndarray,
+        n_evaluations: int,
+    ) -> None:
+        """Initialize a result.
+
+        Args:
+            names: The names of the parameters.
+            first_order: The first-order indices, shape (dim, ).
+            total_order: The total-order indices, shape (dim, ).
+            first_order_ci: The confidence intervals of the first-order indices, shape (dim, 2).
+            total_order_ci: The confidence intervals of the total-order indices, shape (dim, 2).
+            n_evaluations: The number of design points.
+        """
+        self._names = names
+        self._first_order = first_order
+        self._total_order = total_order
+        self._first_order_ci = first_order_ci
+        self._total_order_ci = total_order_ci
+        self._n_evaluations = n_evaluations
+
+    @property
+    def names(self) -> List[str]:
+        return self._names
+
+    @property
+    def first_order(self) -> np.ndarray:
+        return self._first_order
+
+    @property
+    def total_order(self) -> np.ndarray:
+        return self._total_order
+
+    @property
+    def first_order_ci(self) -> np.ndarray:
+        return self._first_order_ci
+
+    @property
+    def total_order_ci(self) -> np.ndarray:
+        return self._total_order_ci
+
+    @property
+    def n_evaluations(self) -> int:
+        return self._n_evaluations
+
+    def ranking(self) -> List[str]:
+        """Return the parameter names by decreasing total-order index."""
+        return [self._names[i] for i in np.argsort(-self._total_order, kind="stable")]
+
+    def important(self, threshold: float = 0.05) -> List[str]:
+        """Return the parameters whose total-order confidence interval reaches `threshold`.
+        The other parameters can be fixed to shrink the search space."""
+        return [n for n, (_, hi) in zip(self._names, self._total_order_ci) if hi >= threshold]
+
+    @property
+    def df(self) -> pd.DataFrame:
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "S1": self._first_order,
+                "S1_lo": self._first_order_ci[:, 0],
+                "S1_hi": self._first_order_ci[:, 1],
+                "ST": self._total_order,
+                "ST_lo": self._total_order_ci[:, 0],
+                "ST_hi": self._total_order_ci[:, 1],
+            },
+            index=self._names,
+        )
+
+    def __repr__(self) -> str:
+        return f"SensitivityResult(ranking={self.ranking()}, n_evaluations={self._n_evaluations})"
+
+
+class SensitivityAnalysis:
+    """Variance-based sensitivity analysis of an objective over control parameters.
+
+    The design points are simulated in batches through `evaluate_batch`,
+    which defaults to local simulation with `evaluation.evaluate`; pass
+    `remote_evaluator(...)` to fan out over Ray workers. Results are cached
+    by `Valuation.digest`, so repeated or enlarged analyses (the Sobol
+    sequence of a seed is extended, not redrawn) only simulate new points.
+    """
+
+    def __init__(
+        self,
+        model: SimulinkModel,
+        objective: Objective,
+        *,
+        parameters: Optional[Sequence[str]] = None,
+        evaluate_batch: Optional[BatchEvaluator] = None,
+        batch_size: int = 64,
+    ) -> None:
+        """Initialize an analysis.
+
+        Args:
+            model: The model to simulate.
+            objective: A function mapping a trace to a scalar.
+            parameters: The names of the analysed parameters. Defaults to all
+                range parameters of `model.control_parameters`; the others
+                keep their default values.
+            evaluate_batch: A function mapping valuations to objective values.
+            batch_size: The number of valuations per call of `evaluate_batch`.
+        """
+        assert batch_size > 0
+        self._model = model
+        self._objective = objective
+        candidates = [p for p in model.control_parameters if isinstance(p, RangeParameter)]
+        if parameters is not None:
+            by_name = {p.name: p for p in candidates}
+            missing = [name for name in parameters if name not in by_name]
+            if missing:
+                raise ValueError(f"Unknown or non-range parameters: {missing}")
+            candidates = [by_name[name] for name in parameters]
+        self._parameters = candidates
+        self._evaluate_batch = evaluate_batch if evaluate_batch is not None else self._evaluate_locally
+        self._batch_size = batch_size
+        self._cache: Dict[str, float] = {}
+
+    @property
+    def parameters(self) -> List[RangeParameter]:
+        return self._parameters
+
+    @property
+    def n_cached(self) -> int:
+        return len(self._cache)
+
+    def to_valuations(self, U: np.ndarray) -> List[Valuation]:
+        """Map points of the unit cube to valuations of the analysed parameters."""
+        lb = np.array([p.lb for p in self._parameters])
+        ub = np.array([p.ub for p in self._parameters])
+        X = lb + U * (ub - lb)
+        default = self._model.create_default_valuation()
+        return [default.patch(Valuation(self._parameters, x.tolist())) for x in X]
+
+    def run(
+        self,
+        n: int,
+        *,
+        n_bootstrap: int = 200,
+        confidence: float = 0.95,
+        seed: Optional[int] = None,
+    ) -> SensitivityResult:
+        """Simulate a Saltelli design and estimate the Sobol indices.
+
+        Args:
+            n: The number of base samples; `n * (dim + 2)` points are simulated.
+            n_bootstrap: The number of bootstrap resamples.
+            confidence: The level of the confidence intervals.
+            seed: The seed of the design and of the bootstrap.
+
+        Returns:
+            The indices.
+        """
+        assert 0 < confidence < 1
+        dim = len(self._parameters)
+        if dim == 0:
+            raise ValueError("No range parameters to analyse.")
+        rng = np.random.default_rng(seed)
+        A, B, AB = saltelli_design(n, dim, rng)
+        U = np.concatenate([A, B, AB.reshape(dim * n, dim)])
+        f = self.evaluate(self.to_valuations(U))
+        fA, fB, fAB = f[:n], f[n : 2 * n], f[2 * n :].reshape(dim, n)
+        first, total = sobol_indices(fA, fB, fAB)
+
+        # All resamples at once: (n_bootstrap, n) indices into the base samples.
+        idx = rng.integers(0, n, size=(n_bootstrap, n))
+        boot_first, boot_total = sobol_indices(fA[idx], fB[idx], fAB[:, idx])
+        alpha = (1 - confidence) / 2
+        q = [alpha, 1 - alpha]
+        return SensitivityResult(
+            [p.name for p in self._parameters],
+            first,
+            total,
+            np.quantile(boot_first, q, axis=1).T,
+            np.quantile(boot_total, q, axis=1).T,
+            len(U),
+        )
+
+    def evaluate(self, valuations: List[Valuation]) -> np.ndarray:
+        """Return the objective values of valuations, simulating uncached ones only.
+
+        Args:
+            valuations: The valuations.
+
+        Returns:
+            The objective values, shape (n, ).
+        """
+        keys = [v.digest() for v in valuations]
+        todo: Dict[str, Valuation] = {}
+        for key, valuation in zip(keys, valuations):
+            if key not in self._cache:
+                todo.setdefault(key, valuation)
+        logger.info(f"Simulating {len(todo)} of {len(valuations)} design points.")
+        pending = list(todo.items())
+        for i in range(0, len(pending), self._batch_size):
+            batch = pending[i : i + self._batch_size]
+            results = self._evaluate_batch([v for _, v in batch])
+            for (key, _), fx in zip(batch, results):
+                self._cache[key] = float(fx)
+        return np.array([self._cache[key] for key in keys], dtype=float)
+
+    def _evaluate_locally(self, valuations: List[Valuation]) -> List[float]:
+        return [e.fx for e in evaluate(self._model, valuations, self._objective)]
+
+
+def remote_evaluator(submit: Callable[[Valuation], Any], *, max_in_flight: int = 8) -> BatchEvaluator:
+    """Make a batch evaluator running one Ray task per valuation.
+
+    Args:
+        submit: A function submitting the simulation of a valuation and
+            returning its object reference. The result is an objective value
+            or an `evaluation.Evaluation`.
+        max_in_flight: The maximum number of pending tasks.
+
+    Returns:
+        A function usable as `evaluate_batch` of `SensitivityAnalysis`.
+    """
+
+    def evaluate_batch(valuations: List[Valuation]) -> List[float]:
+        executor = StreamingExecutor(lambda item: submit(item[1]), max_in_flight=max_in_flight)
+        results: List[float] = [np.nan] * len(valuations)
+        for (i, _), result in executor.map_unordered(enumerate(valuations)):
+            results[i] = float(getattr(result, "fx", result))
+        return results
+
+    return evaluate_batch
+
+
+__all__ = [
+    "SensitivityAnalysis",
+    "SensitivityResult",
+    "saltelli_design",
+    "sobol_indices",
+    "remote_evaluator",
+]
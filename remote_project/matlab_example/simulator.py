@@ -1,21 +1,23 @@
 from __future__ import annotations
 import itertools
-from typing import Any, List, Optional, Tuple
-
-try:
-    import matlab
-except ImportError:
-    _no_matlab = True
-else:
-    _no_matlab = False
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
+import hashlib
 import io
 import logging
 
 import numpy as np
-import pandas as pd
 
 from .core import InputSignal, Parameter, Valuation
+from .faults import SimulationError, is_transient_error
+from .transport import FileTransport
+
+if TYPE_CHECKING:
+    import matlab
+    import pandas as pd
+
+    from .matlab_engine.registry import ModelRegistry
+    from .spec import ModelSpec
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +25,12 @@ class Trace:
     """A trace of a simulation result."""
 
     def __init__(
-        self, time_steps: np.ndarray, values: List[np.ndarray], variables: List[str]
+        self,
+        time_steps: np.ndarray,
+        values: List[np.ndarray],
+        variables: List[str],
+        *,
+        truncated: bool = False,
     ) -> None:
         """Initialize a trace.
 
@@ -32,10 +39,12 @@ class Trace:
             values: The list of the values of the output variables.
                 Each element is a numpy array of shape (n, ).
             variables: The names of the output variables.
+            truncated: Whether the simulation was stopped before the time horizon.
         """
         self._time_steps = time_steps
         self._values = values
         self._variables = variables
+        self._truncated = truncated
 
     @property
     def time_steps(self) -> np.ndarray:
@@ -45,15 +54,65 @@ class Trace:
     def variables(self) -> List[str]:
         return self._variables
 
+    @property
+    def truncated(self) -> bool:
+        return self._truncated
+
     @property
     def df(self) -> pd.DataFrame:
         """Return the trace as a pandas DataFrame."""
+        import pandas as pd
+
         return pd.DataFrame(
             data=np.column_stack(self._values),
             columns=self._variables,
             index=self._time_steps,
         )
 
+    def resample(self, time_steps: np.ndarray) -> Trace:
+        """Return the trace linearly interpolated at the given time steps.
+        Useful to down-sample a trace before sending it over the network.
+
+        Args:
+            time_steps: The new time steps. A numpy array of shape (m, ).
+
+        Returns:
+            The resampled trace.
+        """
+        time_steps = np.asarray(time_steps, dtype=float)
+        return Trace(
+            time_steps=time_steps,
+            values=[np.interp(time_steps, self._time_steps, v) for v in self._values],
+            variables=self._variables,
+            truncated=self._truncated,
+        )
+
+    @staticmethod
+    def concatenate(traces: List[Trace]) -> Trace:
+        """Splice consecutive traces into one.
+        A sample at the start of a trace that repeats the end time of the
+        previous trace is dropped.
+
+        Args:
+            traces: Traces of the same variables, in time order.
+
+        Returns:
+            The spliced trace.
+        """
+        assert len(traces) > 0
+        time_steps = [traces[0].time_steps]
+        values = [list(traces[0]._values)]
+        for trace in traces[1:]:
+            start = 1 if len(trace.time_steps) and trace.time_steps[0] <= time_steps[-1][-1] else 0
+            time_steps.append(trace.time_steps[start:])
+            values.append([v[start:] for v in trace._values])
+        return Trace(
+            time_steps=np.concatenate(time_steps),
+            values=[np.concatenate(vs) for vs in zip(*values)],
+            variables=traces[0].variables,
+            truncated=traces[-1].truncated,
+        )
+
     def __getitem__(self, key: str) -> np.ndarray:
         try:
             return self._values[self._variables.index(key)]
@@ -66,6 +125,75 @@ class Trace:
     def __repr__(self) -> str:
         return self.df.__repr__()
 
+class Fidelity:
+    """Simulation settings trading accuracy for speed.
+    Each setting left as `None` keeps the default of the model."""
+
+    def __init__(
+        self,
+        *,
+        time_step: Optional[float] = None,
+        rel_tol: Optional[float] = None,
+        abs_tol: Optional[float] = None,
+        max_step: Optional[float] = None,
+    ) -> None:
+        """Initialize a fidelity.
+
+        Args:
+            time_step: The time step of the sampled input signals.
+            rel_tol: The relative tolerance of the solver (`RelTol`).
+            abs_tol: The absolute tolerance of the solver (`AbsTol`).
+            max_step: The maximum step size of the solver (`MaxStep`).
+        """
+        self._time_step = time_step
+        self._solver_options = {
+            name: value
+            for name, value in (("RelTol", rel_tol), ("AbsTol", abs_tol), ("MaxStep", max_step))
+            if value is not None
+        }
+
+    @property
+    def time_step(self) -> Optional[float]:
+        return self._time_step
+
+    @property
+    def solver_options(self) -> Dict[str, float]:
+        """The overridden `simset` options."""
+        return self._solver_options
+
+    def __repr__(self) -> str:
+        return f"Fidelity(time_step={self._time_step}, solver_options={self._solver_options})"
+
+
+def _engine_errors() -> Tuple[type, ...]:
+    # Only evaluated when an exception is raised, after the engine is loaded.
+    import matlab.engine
+
+    return (
+        matlab.engine.MatlabExecutionError,
+        matlab.engine.RejectedExecutionError,
+        matlab.engine.EngineError,
+    )
+
+
+def slice_input(model_input: np.ndarray, start: float, end: float) -> np.ndarray:
+    """Return the rows of an input matrix covering `[start, end]`, with one
+    row of margin on each side for interpolation.
+
+    Args:
+        model_input: An input matrix whose first column is the time.
+        start: The start time.
+        end: The end time.
+
+    Returns:
+        The rows of the matrix.
+    """
+    times = model_input[:, 0]
+    lo = max(0, int(np.searchsorted(times, start, side="right")) - 1)
+    hi = min(len(times), int(np.searchsorted(times, end, side="left")) + 1)
+    return model_input[lo:hi]
+
+
 class SimulinkModel:
     """A class for a Simulink model."""
 
@@ -80,6 +208,9 @@ class SimulinkModel:
         time_horizon: float,
         time_step: Optional[float] = None,
         reset_time_horizon: bool = True,
+        registry: Optional[ModelRegistry] = None,
+        file_transport: Optional[FileTransport] = None,
+        spec: Optional[ModelSpec] = None,
     ) -> None:
         """Initialize a Simulink model.
 
@@ -91,6 +222,13 @@ class SimulinkModel:
             output_variables: The name of output variables of the model.
             time_horizon: The default time horizon of the simulation.
             time_step: The size of the time step of the simulation.
+            registry: The registry loading the model in the engine. Defaults
+                to the registry shared by all models of the engine.
+            file_transport: The file transport used for large inputs and
+                outputs (see the `transport` argument of `simulate`).
+            spec: The spec describing this model, if any. Its control
+                parameters, default valuation and input time grid, cached per
+                process, are used instead of being computed for each model.
         """
         self._name = name
         self._matlab_engine = matlab_engine
@@ -102,19 +240,26 @@ class SimulinkModel:
         if reset_time_horizon:
             for signal in self._input_signals:
                 signal.time_horizon = self._time_horizon
-        # flatten
-        parameters_for_input_signals = itertools.chain.from_iterable(
-            [signal.control_parameters for signal in self._input_signals]
-        )
-        self._control_parameters = [
-            *self._model_parameters,
-            *parameters_for_input_signals,
-        ]
-        self._default_valuation = Valuation(
-            self._control_parameters, [p.default for p in self._control_parameters]
-        )
+        self._spec = spec
+        if spec is not None:
+            self._control_parameters = spec.control_parameters
+            self._default_valuation = spec.create_default_valuation()
+        else:
+            # flatten
+            parameters_for_input_signals = itertools.chain.from_iterable(
+                [signal.control_parameters for signal in self._input_signals]
+            )
+            self._control_parameters = [
+                *self._model_parameters,
+                *parameters_for_input_signals,
+            ]
+            self._default_valuation = Valuation(
+                self._control_parameters, [p.default for p in self._control_parameters]
+            )
 
-        self._opts = self._matlab_engine.simget(self._name)
+        self._registry = registry
+        self._file_transport = FileTransport() if file_transport is None else file_transport
+        self.bind(matlab_engine)
 
     @property
     def name(self) -> str:
@@ -136,6 +281,14 @@ class SimulinkModel:
     def control_parameters(self) -> List[Parameter]:
         return self._control_parameters
 
+    @property
+    def time_horizon(self) -> float:
+        return self._time_horizon
+
+    @property
+    def time_step(self) -> float:
+        return self._time_step
+
     def __repr__(self) -> str:
         return (
             f"SimulinkModel(name={self._name}, "
@@ -145,6 +298,47 @@ class SimulinkModel:
             f"time_horizon={self._time_horizon}, time_step={self._time_step})"
         )
 
+    @classmethod
+    def from_spec(cls, spec: ModelSpec, matlab_engine: matlab.MatlabEngine) -> SimulinkModel:
+        """Create a model from a spec. Use `spec.bind(engine)` to reuse models across tasks."""
+        return spec.create_model(matlab_engine)
+
+    def to_spec(self, model_path: Optional[str] = None) -> ModelSpec:
+        """Describe the model without its engine, e.g. to send it to Ray tasks.
+
+        Args:
+            model_path: A directory workers add to the MATLAB path before loading the model.
+        """
+        from .spec import ModelSpec
+
+        return ModelSpec(
+            self._name,
+            model_parameters=self._model_parameters,
+            input_signals=self._input_signals,
+            output_variables=self._output_variables,
+            time_horizon=self._time_horizon,
+            time_step=self._time_step,
+            model_path=model_path,
+        )
+
+    def bind(self, matlab_engine: matlab.MatlabEngine) -> None:
+        """Rebind the model to another MATLAB engine, e.g. after a restart.
+        The engine must be able to find the model.
+
+        Args:
+            matlab_engine: The new engine.
+        """
+        from .matlab_engine.registry import get_model_registry
+
+        if self._registry is None or self._registry.engine is not matlab_engine:
+            self._registry = get_model_registry(matlab_engine)
+        self._matlab_engine = matlab_engine
+        self._registry.acquire(self._name)
+
+    def _options(self) -> Any:
+        # Reloads the model if the registry closed it since the last use.
+        return self._registry.acquire(self._name)
+
     def create_default_valuation(self) -> Valuation:
         """Create the default valuation of the parameters.
         The default valuation is guaranteed to be valid.
@@ -168,35 +362,105 @@ class SimulinkModel:
                 return signal
         raise ValueError(f"Input signal {name} not found.")
 
-    def simulate(
-        self, valuation: Valuation, time_horizon: Optional[float] = None
-    ) -> Trace:
-        """Simulate the model.
+    def build_input(
+        self,
+        valuation: Valuation,
+        time_horizon: Optional[float] = None,
+        time_step: Optional[float] = None,
+    ) -> np.ndarray:
+        """Build the input matrix of a simulation.
 
         Args:
             valuation: A valuation of the parameters of the model.
             time_horizon: The time horizon of the simulation.
+            time_step: The time step of the sampled signals.
+                If `None`, the time step of the model is used.
 
         Returns:
-            The simulation result.
+            A matrix whose first column is the time and the others are the
+            sampled values of the input signals.
         """
         if time_horizon is None:
             time_horizon = self._time_horizon
+        if time_step is None:
+            time_step = self._time_step
+
+        full_valuation = self._default_valuation.patch(valuation)
+        spec = self._spec
+        if spec is not None and time_horizon == spec.time_horizon and time_step == spec.time_step:
+            # The values of a full valuation are in the order of `control_parameters`.
+            return spec.build_input(full_valuation.values)
 
         signal_times = np.linspace(
-            0, time_horizon, int(time_horizon // self._time_step)
+            0, time_horizon, int(time_horizon // time_step)
         )
-        full_valuation = self._default_valuation.patch(valuation)
         signal_values = [
             signal.sample(
                 full_valuation.filter(signal.control_parameters), signal_times
             )
             for signal in self._input_signals
         ]
+        return np.vstack([signal_times, *signal_values]).T
+
+    def input_digest(
+        self, valuation: Valuation, time_horizon: Optional[float] = None
+    ) -> str:
+        """Return a hash of what MATLAB actually receives for a simulation:
+        the model, the time horizon, the input matrix and the values of the
+        model parameters. Valuations with the same digest produce the same trace.
+
+        Args:
+            valuation: A valuation of the parameters of the model.
+            time_horizon: The time horizon of the simulation.
+
+        Returns:
+            A hex string.
+        """
+        if time_horizon is None:
+            time_horizon = self._time_horizon
+        full_valuation = self._default_valuation.patch(valuation)
+        model_input = np.ascontiguousarray(self.build_input(full_valuation, time_horizon), dtype=float)
+        h = hashlib.sha1()
+        h.update(f"{self._name};{float(time_horizon)!r};{model_input.shape};".encode())
+        h.update(model_input.tobytes())
+        h.update(full_valuation.filter(self._model_parameters).digest().encode())
+        return h.hexdigest()
+
+    def simulate(
+        self,
+        valuation: Valuation,
+        time_horizon: Optional[float] = None,
+        *,
+        fidelity: Optional[Fidelity] = None,
+        transport: str = "auto",
+    ) -> Trace:
+        """Simulate the model.
+
+        Args:
+            valuation: A valuation of the parameters of the model.
+            time_horizon: The time horizon of the simulation.
+            fidelity: Overrides of the input time step and solver settings.
+                If `None`, the model settings are used.
+            transport: How the input and output cross the engine boundary:
+                "engine" as `matlab.double` arrays, "file" through memory-mapped
+                files (see `FileTransport`), or "auto" to use files for large arrays.
+
+        Returns:
+            The simulation result.
+        """
+        import matlab
+
+        if time_horizon is None:
+            time_horizon = self._time_horizon
+        time_step = None if fidelity is None else fidelity.time_step
+        model_input = self.build_input(valuation, time_horizon, time_step)
+        if self._use_files(transport, 0.0, time_horizon, model_input):
+            return self._simulate_files(0.0, time_horizon, model_input, self._options_for(fidelity), [])
 
         result_time_steps, data = self._simulate(
             matlab.double([0, time_horizon]),
-            matlab.double(np.vstack([signal_times, *signal_values]).T),
+            matlab.double(model_input),
+            self._options_for(fidelity),
         )
 
         return Trace(
@@ -205,24 +469,133 @@ class SimulinkModel:
             variables=self._output_variables,
         )
 
+    def simulate_segment(
+        self,
+        start: float,
+        end: float,
+        model_input: np.ndarray,
+        *,
+        initial_state: Optional[str] = None,
+        final_state: Optional[str] = None,
+        transport: str = "auto",
+    ) -> Trace:
+        """Simulate the model on `[start, end]`, optionally resuming from and
+        saving an operating point. Operating points stay in the MATLAB base
+        workspace; only their variable names cross the engine boundary.
+
+        Args:
+            start: The start time of the segment.
+            end: The end time of the segment.
+            model_input: The input matrix (see `build_input`) covering the segment.
+            initial_state: The workspace variable holding the operating point
+                to resume from. It must have been saved at `start`.
+            final_state: The workspace variable to save the final operating point to.
+            transport: How the input and output cross the engine boundary (see `simulate`).
+
+        Returns:
+            The simulation result on the segment.
+        """
+        import matlab
+
+        commands = []
+        if final_state is not None:
+            commands.append(f"set_param('{self._name}', 'SaveOperatingPoint', 'on');")
+            commands.append(f"opts = simset(opts, 'SaveFinalState', 'on', 'FinalStateName', '{final_state}');")
+        else:
+            commands.append("opts = simset(opts, 'SaveFinalState', 'off');")
+        if initial_state is not None:
+            commands.append(f"opts = simset(opts, 'InitialState', {initial_state});")
+        if self._use_files(transport, start, end, model_input):
+            return self._simulate_files(start, end, model_input, self._options(), commands)
+
+        self._matlab_engine.workspace["sim_opts"] = self._options()
+        self._matlab_engine.workspace["sim_u"] = matlab.double(model_input)
+        commands.insert(0, "opts = sim_opts;")
+        commands.append(f"[sim_t, ~, sim_y] = sim('{self._name}', [{start!r} {end!r}], opts, sim_u);")
+        self._eval(" ".join(commands))
+        return Trace(
+            time_steps=np.array(self._matlab_engine.workspace["sim_t"]).flatten(),
+            values=list(np.array(self._matlab_engine.workspace["sim_y"]).T),
+            variables=self._output_variables,
+        )
+
+    def _use_files(self, transport: str, start: float, end: float, model_input: np.ndarray) -> bool:
+        # The output size is estimated from the time step of the model.
+        n_steps = (end - start) / self._time_step + 1
+        output_bytes = 8 * n_steps * (1 + len(self._output_variables))
+        return self._file_transport.use_files(transport, model_input.nbytes + output_bytes)
+
+    def _simulate_files(
+        self, start: float, end: float, model_input: np.ndarray, opts: Any, option_commands: List[str]
+    ) -> Trace:
+        transport = self._file_transport
+        input_path = transport.write(model_input)
+        output_path = transport.new_path("out")
+        commands = [
+            "opts = sim_opts;",
+            *option_commands,
+            transport.load_command(input_path, model_input.shape, "sim_u"),
+            f"[sim_t, ~, sim_y] = sim('{self._name}', [{start!r} {end!r}], opts, sim_u);",
+            transport.save_command(output_path, "sim_t", "sim_y"),
+            "clear sim_u sim_t sim_y;",
+        ]
+        try:
+            self._matlab_engine.workspace["sim_opts"] = opts
+            self._eval(" ".join(commands))
+            time_steps, values = transport.read(output_path)
+        finally:
+            # `read` removes the output file; this covers a failure before it.
+            transport.remove(input_path)
+            transport.remove(output_path)
+        return Trace(
+            time_steps=time_steps,
+            values=list(values),
+            variables=self._output_variables,
+        )
+
+    def clear_variables(self, *names: str) -> None:
+        """Clear variables from the MATLAB base workspace, e.g. saved operating points."""
+        if names:
+            self._eval("clear " + " ".join(names))
+
+    def _eval(self, command: str) -> None:
+        engine_stdout = io.StringIO()
+        try:
+            self._matlab_engine.eval(command, nargout=0, stdout=engine_stdout)
+        except _engine_errors() as e:
+            raise SimulationError(
+                "Matlab failed to execute simulation.", transient=is_transient_error(e)
+            ) from e
+        finally:
+            if engine_stdout.getvalue():
+                logger.debug("[MATLAB stdout] " + engine_stdout.getvalue())
+
+    def _options_for(self, fidelity: Optional[Fidelity]) -> Any:
+        if fidelity is None or not fidelity.solver_options:
+            return self._options()
+        # `simget` returns the options struct as a dict, so overriding its
+        # fields is equivalent to `simset` without a round trip to MATLAB.
+        opts = dict(self._options())
+        opts.update(fidelity.solver_options)
+        return opts
+
     def _simulate(
-        self, sim_t: matlab.double, model_input: matlab.double
+        self, sim_t: matlab.double, model_input: matlab.double, opts: Any = None
     ) -> Tuple[matlab.double, matlab.double]:
         engine_stdout = io.StringIO()
         try:
             result_time_steps, opts, data = self._matlab_engine.sim(
                 self._name,
                 sim_t,
-                self._opts,
+                self._options() if opts is None else opts,
                 model_input,
                 nargout=len(self._output_variables),
                 stdout=engine_stdout,
             )
-        except (
-            matlab.engine.MatlabExecutionError,
-            matlab.engine.RejectedExecutionError,
-        ) as e:
-            raise RuntimeError("Matlab failed to execute simulation.") from e
+        except _engine_errors() as e:
+            raise SimulationError(
+                "Matlab failed to execute simulation.", transient=is_transient_error(e)
+            ) from e
         finally:
             if engine_stdout.getvalue():
                 logger.debug("[MATLAB stdout] " + engine_stdout.getvalue())
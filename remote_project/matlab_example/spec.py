@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import itertools
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .core import InputSignal, Parameter, RangeParameter, StaticParameter, Valuation
+
+logger = logging.getLogger(__name__)
+
+
+class ModelSpec:
+    """A serializable description of a Simulink model.
+
+    Unlike `SimulinkModel`, a spec holds no engine, so it is cheap to send to
+    Ray tasks (put it in the object store once and pass the reference).
+    Workers turn it into a model with `bind`, which caches the model per
+    content hash and engine, so repeated tasks skip the set-up as long as
+    they share an engine (see `matlab_engine.MatlabWorker`).
+
+    Derived data (flattened control parameters, default valuation, input
+    time grid and the index map from time steps to control points) is not
+    pickled; it is computed on first use and cached in the process by
+    content hash, so specs unpickled by later tasks reuse it. Models created
+    from the spec build their inputs from it as well.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        model_parameters: List[Parameter],
+        input_signals: List[InputSignal],
+        output_variables: List[str],
+        time_horizon: float,
+        time_step: Optional[float] = None,
+        model_path: Optional[str] = None,
+    ) -> None:
+        """Initialize a spec.
+
+        Args:
+            name: The name of the model.
+            model_parameters: The parameters of the model
+                (not including the parameters for the control points in input_signals).
+            input_signals: The input signals of the model. They are copied and
+                set to the time horizon of the model.
+            output_variables: The name of output variables of the model.
+            time_horizon: The default time horizon of the simulation.
+            time_step: The size of the time step of the simulation.
+            model_path: A directory added to the MATLAB path before loading the model.
+        """
+        self._name = name
+        self._model_parameters = list(model_parameters)
+        self._input_signals = [copy.copy(s) for s in input_signals]
+        for signal in self._input_signals:
+            signal.time_horizon = time_horizon
+        self._output_variables = list(output_variables)
+        self._time_horizon = time_horizon
+        self._time_step = 0.1 if time_step is None else time_step
+        self._model_path = model_path
+        self._digest: Optional[str] = None
+        self._derived: Optional[Dict[str, Any]] = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def model_parameters(self) -> List[Parameter]:
+        return self._model_parameters
+
+    @property
+    def input_signals(self) -> List[InputSignal]:
+        return self._input_signals
+
+    @property
+    def output_variables(self) -> List[str]:
+        return self._output_variables
+
+    @property
+    def time_horizon(self) -> float:
+        return self._time_horizon
+
+    @property
+    def time_step(self) -> float:
+        return self._time_step
+
+    @property
+    def model_path(self) -> Optional[str]:
+        return self._model_path
+
+    @property
+    def digest(self) -> str:
+        """A hash of the content of the spec, equal across processes."""
+        if self._digest is None:
+            h = hashlib.sha1()
+            h.update(f"{self._name};{float(self._time_horizon)!r};{float(self._time_step)!r};".encode())
+            h.update(f"{self._model_path};{self._output_variables};".encode())
+            for p in self._model_parameters:
+                h.update(_describe(p).encode())
+            for s in self._input_signals:
+                h.update(f"{s.name};{float(s.lb)!r};{float(s.ub)!r};{s.n_control_points};".encode())
+            self._digest = h.hexdigest()
+        return self._digest
+
+    @property
+    def control_parameters(self) -> List[Parameter]:
+        return self._derive()["control_parameters"]
+
+    @property
+    def time_grid(self) -> np.ndarray:
+        """The time steps of the input matrix, as in `SimulinkModel.build_input`."""
+        return self._derive()["time_grid"]
+
+    @property
+    def sample_index(self) -> np.ndarray:
+        """For each input signal and time step, the index of the active
+        control point in `control_parameters`. Shape (n_signals, n_steps)."""
+        return self._derive()["sample_index"]
+
+    def create_default_valuation(self) -> Valuation:
+        return self._derive()["default_valuation"].clone()
+
+    def to_valuation(self, x: np.ndarray) -> Valuation:
+        """Make a valuation of the control parameters from a vector."""
+        return Valuation(self.control_parameters, [float(v) for v in x])
+
+    def build_input(self, x: np.ndarray) -> np.ndarray:
+        """Build the input matrix for a vector of control parameter values,
+        with the default time horizon and step, without going through `Valuation`.
+
+        Args:
+            x: The values of `control_parameters`, shape (n_control_parameters, ).
+
+        Returns:
+            A matrix whose first column is the time and the others are the
+            sampled values of the input signals.
+        """
+        x = np.asarray(x, dtype=float)
+        return np.column_stack([self.time_grid, x[self.sample_index].T])
+
+    def _derive(self) -> Dict[str, Any]:
+        if self._derived is not None:
+            return self._derived
+        with _models_lock:
+            self._derived = _derived.get(self.digest)
+        if self._derived is not None:
+            return self._derived
+        control_parameters = [
+            *self._model_parameters,
+            *itertools.chain.from_iterable(s.control_parameters for s in self._input_signals),
+        ]
+        horizon, step = self._time_horizon, self._time_step
+        time_grid = np.linspace(0, horizon, int(horizon // step))
+        sample_index = np.zeros((len(self._input_signals), len(time_grid)), dtype=int)
+        offset = len(self._model_parameters)
+        for i, signal in enumerate(self._input_signals):
+            active = np.searchsorted(signal.time_points, time_grid, side="right") - 1
+            sample_index[i] = offset + active
+            offset += signal.n_control_points
+        self._derived = {
+            "control_parameters": control_parameters,
+            "default_valuation": Valuation(control_parameters, [p.default for p in control_parameters]),
+            "time_grid": time_grid,
+            "sample_index": sample_index,
+        }
+        with _models_lock:
+            _derived[self.digest] = self._derived
+        return self._derived
+
+    def create_model(self, matlab_engine: Any) -> Any:
+        """Create a new `SimulinkModel` bound to an engine. Prefer `bind`,
+        which reuses models across tasks."""
+        from .simulator import SimulinkModel
+
+        if self._model_path is not None:
+            matlab_engine.addpath(self._model_path, nargout=0)
+        return SimulinkModel(
+            self._name,
+            matlab_engine=matlab_engine,
+            model_parameters=self._model_parameters,
+            input_signals=self._input_signals,
+            output_variables=self._output_variables,
+            time_horizon=self._time_horizon,
+            time_step=self._time_step,
+            reset_time_horizon=False,
+            spec=self,
+        )
+
+    def bind(self, matlab_engine: Any) -> Any:
+        """Return the `SimulinkModel` of this spec on an engine, created on first use.
+
+        Args:
+            matlab_engine: The worker-local MATLAB engine.
+
+        Returns:
+            The model, shared by all equal specs bound to the engine.
+        """
+        key = (self.digest, id(matlab_engine))
+        with _models_lock:
+            entry = _models.get(key)
+            if entry is not None and entry[0] is matlab_engine:
+                return entry[1]
+        logger.info(f"Binding model {self._name} ({self.digest[:8]}) to a MATLAB engine.")
+        model = self.create_model(matlab_engine)
+        with _models_lock:
+            _models[key] = (matlab_engine, model)
+        return model
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_derived"] = None
+        return state
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ModelSpec) and self.digest == other.digest
+
+    def __hash__(self) -> int:
+        return hash(self.digest)
+
+    def __repr__(self) -> str:
+        return (
+            f"ModelSpec(name={self._name}, "
+            f"input_signals={self._input_signals}, "
+            f"output_variables={self._output_variables}, "
+            f"time_horizon={self._time_horizon}, time_step={self._time_step}, "
+            f"digest={self.digest[:8]})"
+        )
+
+
+# Worker-local models, keyed by spec digest and engine id; the engine is
+# kept to detect reused ids.
+_models: Dict[Tuple[str, int], Tuple[Any, Any]] = {}
+_derived: Dict[str, Dict[str, Any]] = {}
+_models_lock = threading.Lock()
+
+
+def clear_bound_models(matlab_engine: Any = None) -> None:
+    """Forget the models created by `ModelSpec.bind`, e.g. after an engine exits.
+    `matlab_engine.exit_engine` calls this.
+
+    Args:
+        matlab_engine: Only forget the models of this engine. All if `None`.
+    """
+    with _models_lock:
+        for key in list(_models):
+            if matlab_engine is None or _models[key][0] is matlab_engine:
+                del _models[key]
+
+
+def _describe(p: Parameter) -> str:
+    if isinstance(p, RangeParameter):
+        return f"range:{p.name};{float(p.lb)!r};{float(p.ub)!r};{float(p.default)!r};"
+    if isinstance(p, StaticParameter):
+        return f"static:{p.name};{float(p.value)!r};"
+    return f"{type(p).__name__}:{p.name};"
+
+
+__all__ = [
+    "ModelSpec",
+    "clear_bound_models",
+]
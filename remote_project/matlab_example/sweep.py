@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .core import Parameter, RangeParameter, Valuation
+from .executor import StreamingExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Sweep:
+    """An abstract, lazily enumerated set of points over parameters.
+
+    A sweep is a declarative description: points are computed from their
+    index on demand, so a sweep of billions of points takes no memory and
+    is cheap to send to Ray workers, which enumerate their own shard.
+    """
+
+    @property
+    def parameters(self) -> List[Parameter]:
+        raise NotImplementedError()
+
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+    def values(self, indices: np.ndarray) -> np.ndarray:
+        """Return the points at the given indices.
+
+        Args:
+            indices: Indices in `[0, len(self))`, an integer array of shape (k, ).
+
+        Returns:
+            The values of `parameters` at each index, shape (k, n_parameters).
+        """
+        raise NotImplementedError()
+
+    def describe(self) -> str:
+        """A canonical description of the sweep, used to match checkpoints."""
+        raise NotImplementedError()
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha1(self.describe().encode()).hexdigest()
+
+    def valuations(
+        self, start: int = 0, stop: Optional[int] = None, *, base: Optional[Valuation] = None, chunk_size: int = 1024
+    ) -> Iterator[Tuple[int, Valuation]]:
+        """Enumerate `(index, valuation)` pairs of an index range lazily.
+
+        Args:
+            start: The first index.
+            stop: The end of the range. Defaults to the length of the sweep.
+            base: A valuation patched with the values of the sweep, e.g.
+                `model.create_default_valuation()`. Otherwise the valuations
+                only cover `parameters`.
+            chunk_size: The number of points decoded at once.
+
+        Yields:
+            The index and the valuation of each point.
+        """
+        stop = len(self) if stop is None else stop
+        for lo in range(start, stop, chunk_size):
+            hi = min(lo + chunk_size, stop)
+            block = self.values(np.arange(lo, hi, dtype=np.int64))
+            for offset, x in enumerate(block):
+                valuation = Valuation(self.parameters, x.tolist())
+                yield lo + offset, valuation if base is None else base.patch(valuation)
+
+    def n_shards(self, shard_size: int) -> int:
+        """The number of contiguous shards of `shard_size` points (the last may be smaller)."""
+        assert shard_size > 0
+        return -(-len(self) // shard_size)
+
+    def shard(self, shard: int, shard_size: int) -> range:
+        """The index range of a shard."""
+        assert 0 <= shard < self.n_shards(shard_size)
+        start = shard * shard_size
+        return range(start, min(start + shard_size, len(self)))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(n={len(self)}, parameters={[p.name for p in self.parameters]})"
+
+
+class Values(Sweep):
+    """The values of one parameter."""
+
+    def __init__(self, parameter: Parameter, values: Sequence[float]) -> None:
+        assert len(values) > 0
+        self._parameter = parameter
+        self._values = np.asarray(values, dtype=float)
+
+    @classmethod
+    def linspace(cls, parameter: RangeParameter, n: int) -> Values:
+        """`n` evenly spaced values over the range of the parameter, bounds included."""
+        return cls(parameter, np.linspace(parameter.lb, parameter.ub, n))
+
+    @property
+    def parameters(self) -> List[Parameter]:
+        return [self._parameter]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def values(self, indices: np.ndarray) -> np.ndarray:
+        return self._values[np.asarray(indices, dtype=np.int64)][:, None]
+
+    def describe(self) -> str:
+        return f"values({self._parameter.name};{','.join(repr(float(v)) for v in self._values)})"
+
+
+class Grid(Sweep):
+    """The Cartesian product of sweeps over disjoint parameters.
+    Points are enumerated in mixed radix order, the last sweep varying fastest."""
+
+    def __init__(self, *sweeps: Sweep) -> None:
+        assert len(sweeps) > 0
+        names = [p.name for s in sweeps for p in s.parameters]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Grid axes share parameters: {names}")
+        self._sweeps = list(sweeps)
+        self._radices = [len(s) for s in sweeps]
+        self._len = int(np.prod(self._radices, dtype=object))
+        if self._len >= 2**63:
+            raise ValueError(f"Grid of {self._len} points cannot be indexed.")
+        # The stride of an axis is the product of the radices after it.
+        self._strides = [int(np.prod(self._radices[i + 1:], dtype=object)) for i in range(len(sweeps))]
+
+    @classmethod
+    def over(cls, parameters: Sequence[RangeParameter], n: int) -> Grid:
+        """A grid of `n` evenly spaced values per parameter, e.g. over the
+        control points of input signals."""
+        return cls(*(Values.linspace(p, n) for p in parameters))
+
+    @property
+    def parameters(self) -> List[Parameter]:
+        return [p for s in self._sweeps for p in s.parameters]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def values(self, indices: np.ndarray) -> np.ndarray:
+        indices = np.asarray(indices, dtype=np.int64)
+        columns = [
+            sweep.values((indices // stride) % radix)
+            for sweep, stride, radix in zip(self._sweeps, self._strides, self._radices)
+        ]
+        return np.hstack(columns)
+
+    def describe(self) -> str:
+        return f"grid({';'.join(s.describe() for s in self._sweeps)})"
+
+
+class Concat(Sweep):
+    """The union of sweeps over the same parameters, enumerated one after the other.
+    Points shared by several sweeps are not deduplicated."""
+
+    def __init__(self, *sweeps: Sweep) -> None:
+        assert len(sweeps) > 0
+        names = [p.name for p in sweeps[0].parameters]
+        for sweep in sweeps[1:]:
+            if [p.name for p in sweep.parameters] != names:
+                raise ValueError("Concatenated sweeps must have the same parameters in the same order.")
+        self._sweeps = list(sweeps)
+        self._offsets = np.cumsum([0] + [len(s) for s in sweeps])
+
+    @property
+    def parameters(self) -> List[Parameter]:
+        return self._sweeps[0].parameters
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def values(self, indices: np.ndarray) -> np.ndarray:
+        indices = np.asarray(indices, dtype=np.int64)
+        which = np.searchsorted(self._offsets, indices, side="right") - 1
+        result = np.empty((len(indices), len(self.parameters)))
+        for i, sweep in enumerate(self._sweeps):
+            mask = which == i
+            if mask.any():
+                result[mask] = sweep.values(indices[mask] - self._offsets[i])
+        return result
+
+    def describe(self) -> str:
+        return f"concat({';'.join(s.describe() for s in self._sweeps)})"
+
+
+class RandomSubset(Sweep):
+    """`n` distinct points of a sweep drawn uniformly, in index order.
+    Only the `n` selected indices are stored, not the whole sweep."""
+
+    def __init__(self, sweep: Sweep, n: int, *, seed: int = 0) -> None:
+        n = min(n, len(sweep))
+        self._sweep = sweep
+        self._seed = seed
+        rng = np.random.default_rng(seed)
+        self._indices = np.sort(rng.choice(len(sweep), size=n, replace=False)).astype(np.int64)
+
+    @property
+    def parameters(self) -> List[Parameter]:
+        return self._sweep.parameters
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def values(self, indices: np.ndarray) -> np.ndarray:
+        return self._sweep.values(self._indices[np.asarray(indices, dtype=np.int64)])
+
+    def describe(self) -> str:
+        return f"random({self._sweep.describe()};{len(self._indices)};{self._seed})"
+
+
+class SweepCursor:
+    """The completed shards of a sweep, persisted to a JSON file.
+
+    The file holds a watermark below which all shards are done and the set
+    of completed shards above it, so it stays small however long the sweep.
+    It is rewritten atomically after each shard.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], sweep: Sweep, shard_size: int) -> None:
+        """Open a cursor, loading it if the file exists.
+        Raises an exception if the file belongs to another sweep.
+
+        Args:
+            path: The cursor file.
+            sweep: The sweep.
+            shard_size: The number of points per shard.
+        """
+        self._path = os.fspath(path)
+        self._n_shards = sweep.n_shards(shard_size)
+        self._key = {"digest": sweep.digest, "n": len(sweep), "shard_size": shard_size}
+        self._watermark = 0
+        self._done: set = set()
+        if os.path.exists(self._path):
+            with open(self._path, "r") as f:
+                state = json.load(f)
+            if state["key"] != self._key:
+                raise ValueError(f"Cursor {self._path} belongs to another sweep or shard size.")
+            self._watermark = state["watermark"]
+            self._done = set(state["done"])
+            logger.info(f"Resuming sweep at {self.n_done}/{self._n_shards} shards.")
+
+    @property
+    def n_shards(self) -> int:
+        return self._n_shards
+
+    @property
+    def n_done(self) -> int:
+        return self._watermark + len(self._done)
+
+    @property
+    def finished(self) -> bool:
+        return self._watermark >= self._n_shards
+
+    def is_done(self, shard: int) -> bool:
+        return shard < self._watermark or shard in self._done
+
+    def pending(self) -> Iterator[int]:
+        """Iterate over the shards that are not done, lazily."""
+        for shard in range(self._watermark, self._n_shards):
+            if shard not in self._done:
+                yield shard
+
+    def complete(self, shard: int) -> None:
+        """Mark a shard as done and save the cursor."""
+        self._done.add(shard)
+        while self._watermark in self._done:
+            self._done.remove(self._watermark)
+            self._watermark += 1
+        self._save()
+
+    def _save(self) -> None:
+        state = {"key": self._key, "watermark": self._watermark, "done": sorted(self._done)}
+        tmp = self._path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path)
+
+
+def run_sweep(
+    sweep: Sweep,
+    submit: Callable[[Any, int, int], Any],
+    *,
+    shard_size: int = 256,
+    cursor: Optional[Union[str, os.PathLike]] = None,
+    max_in_flight: int = 8,
+) -> Iterator[Tuple[range, Any]]:
+    """Run a sweep as Ray tasks, one per shard, resuming from a cursor.
+
+    The sweep is put in the object store once, and each task receives its
+    reference with an index range, e.g.
+
+        @ray.remote
+        def simulate_shard(sweep, start, stop):
+            model = spec.bind(engine)
+            return [evaluate(model, [v], objective)[0].fx
+                    for _, v in sweep.valuations(start, stop, base=model.create_default_valuation())]
+
+        for shard, fxs in run_sweep(sweep, simulate_shard.remote, cursor="sweep.json"):
+            ...
+
+    A shard is marked done in the cursor once its result has been consumed,
+    so results should be persisted by the caller before asking for the next one.
+
+    Args:
+        sweep: The sweep.
+        submit: A function `(sweep_ref, start, stop) -> object reference`.
+        shard_size: The number of points per task.
+        cursor: The cursor file. If `None`, the sweep is not resumable.
+        max_in_flight: The maximum number of pending tasks.
+
+    Yields:
+        The index range of each shard and the result of its task, in completion order.
+    """
+    import ray
+
+    state = SweepCursor(cursor, sweep, shard_size) if cursor is not None else None
+    pending = state.pending() if state is not None else iter(range(sweep.n_shards(shard_size)))
+    sweep_ref = ray.put(sweep)
+
+    def submit_shard(shard: int) -> Any:
+        indices = sweep.shard(shard, shard_size)
+        return submit(sweep_ref, indices.start, indices.stop)
+
+    executor = StreamingExecutor(submit_shard, max_in_flight=max_in_flight)
+    for shard, result in executor.map_unordered(pending):
+        yield sweep.shard(shard, shard_size), result
+        if state is not None:
+            state.complete(shard)
+
+
+__all__ = [
+    "Sweep",
+    "Values",
+    "Grid",
+    "Concat",
+    "RandomSubset",
+    "SweepCursor",
+    "run_sweep",
+]
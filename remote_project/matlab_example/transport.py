@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import tempfile
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ("auto", "engine", "file")
+
+
+class FileTransport:
+    """Move simulation inputs and outputs through files instead of the engine API.
+
+    Converting large arrays to and from `matlab.double` dominates the cost of
+    long simulations. With this transport the input matrix is written as raw
+    doubles that MATLAB maps with `memmapfile`, and MATLAB writes the output
+    with `fwrite` to a file that is read back with `numpy.fromfile`; only the
+    file paths cross the engine boundary. Files go to a tmpfs (`/dev/shm`)
+    when available, so nothing touches the disk.
+
+    The engine and MATLAB must run on the same host.
+    """
+
+    def __init__(self, directory: Optional[str] = None, *, threshold_bytes: int = 1 << 20) -> None:
+        """Initialize a transport.
+
+        Args:
+            directory: The directory of the transfer files. Defaults to
+                `/dev/shm` if it exists, otherwise the temporary directory.
+            threshold_bytes: The input plus expected output size from which
+                `transport="auto"` uses files.
+        """
+        if directory is None:
+            directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        if not os.path.isdir(directory):
+            raise ValueError(f"Path {directory} does not exist or is not a directory.")
+        self._directory = directory
+        self._threshold_bytes = threshold_bytes
+        self._ids = itertools.count()
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def use_files(self, transport: str, n_bytes: int) -> bool:
+        """Decide whether to use files for a transfer.
+
+        Args:
+            transport: "file", "engine", or "auto" to decide by size.
+            n_bytes: The expected number of bytes transferred.
+
+        Returns:
+            True to use files.
+        """
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport {transport}. Expected one of {TRANSPORTS}.")
+        if transport == "auto":
+            return n_bytes >= self._threshold_bytes
+        return transport == "file"
+
+    def new_path(self, kind: str) -> str:
+        return os.path.join(self._directory, f"matlab_example_{os.getpid()}_{next(self._ids)}_{kind}.bin")
+
+    def write(self, array: np.ndarray) -> str:
+        """Write a matrix as raw doubles in column-major (MATLAB) order.
+
+        Returns:
+            The path of the file.
+        """
+        path = self.new_path("in")
+        # The C-order bytes of the transpose are the column-major bytes of the matrix.
+        np.ascontiguousarray(np.asarray(array, dtype=np.float64).T).tofile(path)
+        return path
+
+    @staticmethod
+    def load_command(path: str, shape: Tuple[int, int], variable: str) -> str:
+        """Return MATLAB code mapping a file written by `write` to a variable."""
+        n, m = shape
+        return (
+            f"sim_mm = memmapfile('{_quote(path)}', 'Format', {{'double', [{n} {m}], 'u'}}); "
+            f"{variable} = sim_mm.Data.u; clear sim_mm;"
+        )
+
+    @staticmethod
+    def save_command(path: str, time_variable: str, values_variable: str) -> str:
+        """Return MATLAB code writing a simulation result to a file read by `read`."""
+        path = _quote(path)
+        return (
+            f"sim_fid = fopen('{path}', 'w'); "
+            f"if sim_fid < 0, error('Cannot open {path} for writing.'); end; "
+            f"fwrite(sim_fid, size({values_variable}), 'double'); "
+            f"fwrite(sim_fid, {time_variable}, 'double'); "
+            f"fwrite(sim_fid, {values_variable}, 'double'); "
+            f"fclose(sim_fid); clear sim_fid;"
+        )
+
+    def read(self, path: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Read a result written by `save_command` and remove the file.
+
+        The file is read in one call rather than memory-mapped: a mapping
+        would keep a file descriptor and the tmpfs pages alive for as long
+        as any returned trace is referenced.
+
+        Returns:
+            The time steps of shape (n, ) and the values of shape (n_variables, n).
+        """
+        try:
+            data = np.fromfile(path, dtype=np.float64)
+        finally:
+            self.remove(path)
+        n, k = int(data[0]), int(data[1])
+        time_steps = data[2 : 2 + n]
+        values = data[2 + n : 2 + n + n * k].reshape(k, n)
+        return time_steps, values
+
+    @staticmethod
+    def remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove transfer file {path}: {e}")
+
+
+def _quote(text: str) -> str:
+    # Escape a string for a single-quoted MATLAB character vector.
+    return text.replace("'", "''")
+
+
+__all__ = [
+    "FileTransport",
+    "TRANSPORTS",
+]
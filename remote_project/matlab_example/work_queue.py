@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointedWorkQueue:
+    """A work queue persisted to a JSON-lines file.
+
+    Each item has a key and a JSON-serializable payload (e.g. the values of a
+    valuation). Completed items and their results are appended to the file as
+    they finish, so a restarted driver resubmits only unfinished items
+    instead of the whole campaign.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        """Open a queue, loading its checkpoint if the file exists.
+
+        Args:
+            path: The checkpoint file.
+        """
+        self._path = os.fspath(path)
+        self._payloads: Dict[str, Any] = {}
+        self._results: Dict[str, Any] = {}
+        if os.path.exists(self._path):
+            self._load()
+
+    def _load(self) -> None:
+        with open(self._path, "r") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Interrupted while writing
+                entry = json.loads(line)
+                if entry["op"] == "add":
+                    self._payloads[entry["key"]] = entry["payload"]
+                elif entry["op"] == "done":
+                    self._results[entry["key"]] = entry["result"]
+        logger.info(f"Loaded work queue {self._path}: {len(self._results)}/{len(self._payloads)} done.")
+
+    def _append(self, entries: List[dict]) -> None:
+        with open(self._path, "a") as f:
+            f.write("".join(json.dumps(e) + "\n" for e in entries))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def add(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """Add items to the queue. Items already in the queue are ignored.
+
+        Args:
+            items: Pairs of a key and a JSON-serializable payload.
+        """
+        entries = []
+        for key, payload in items:
+            if key in self._payloads:
+                continue
+            self._payloads[key] = payload
+            entries.append({"op": "add", "key": key, "payload": payload})
+        if entries:
+            self._append(entries)
+
+    def complete(self, key: str, result: Any = None) -> None:
+        """Mark an item as done.
+
+        Args:
+            key: The key of the item.
+            result: A JSON-serializable result of the item.
+        """
+        if key not in self._payloads:
+            raise KeyError(f"Item {key} is not in the queue.")
+        self._results[key] = result
+        self._append([{"op": "done", "key": key, "result": result}])
+
+    def pending(self) -> List[Tuple[str, Any]]:
+        """Return the unfinished items in insertion order."""
+        return [(k, p) for k, p in self._payloads.items() if k not in self._results]
+
+    @property
+    def results(self) -> Dict[str, Any]:
+        return self._results
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def __repr__(self) -> str:
+        return f"CheckpointedWorkQueue(path={self._path}, done={len(self._results)}/{len(self._payloads)})"
+
+
+__all__ = [
+    "CheckpointedWorkQueue",
+]
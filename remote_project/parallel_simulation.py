@@ -1,43 +1,41 @@
 import ray
 
-import matlab.engine
-import logging
+CPU_SLOT_DIR = "/tmp/matlab_cpu_slots"
 
-logging.getLogger
 
-
-@ray.remote(num_cpus=2, resources={"matlab": 1})
-def run_simulator():
-    from matlab_example.core import InputSignal
-    from matlab_example.simulator import SimulinkModel
+def setup_engine(eng):
     import os
     import pathlib
 
-    TIME_HORIZON = 30
-
-    eng = matlab.engine.start_matlab()
     eng.cd(os.getcwd())
     eng.addpath(str((pathlib.Path(__file__).parent / "simulators")))
 
-    mdl = SimulinkModel(
-        "Autotrans_shift",
-        matlab_engine=eng,
-        model_parameters = [],
-        input_signals = [
-            InputSignal("throttle", lb=0, ub=100, n_control_point=5),
-            InputSignal("brake", lb=0, ub=100, n_control_point=5),
-        ],
-        output_variables = ["speed", "rpm", "gear"],
-        time_horizon = TIME_HORIZON,
-        time_step = 0.1,
+
+def simulate(eng, spec, x, objective, n_trace_points=None):
+    from matlab_example.evaluation import evaluate
+
+    mdl = spec.bind(eng)
+    valuation = spec.to_valuation(x)
+    # Only (x, fx) and the falsifying traces travel back to the driver.
+    evaluations = evaluate(
+        mdl,
+        [valuation],
+        objective,
+        keep_traces="falsifying",
+        n_trace_points=n_trace_points,
     )
+    return evaluations[0]
+
 
-    default_val = mdl.create_default_valuation()
-    trace = mdl.simulate(default_val)
+def cpu_slot_pool():
+    import os
 
-    eng.exit()
+    from matlab_example.matlab_engine import CpuSlotPool
 
-    return trace
+    # Called in each actor: its slot is its share of the node (num_cpus=2).
+    # Set MATLAB_CPU_SLOTS on the nodes to override the mapping.
+    os.makedirs(CPU_SLOT_DIR, exist_ok=True)
+    return CpuSlotPool.from_ray(CPU_SLOT_DIR)
 
 
 runtime_env = {
@@ -46,9 +44,63 @@ runtime_env = {
 
 ray.init(runtime_env=runtime_env)
 
-# Create an actor from this class.
-results = ray.get([run_simulator.remote() for _ in range(2)])
+import numpy as np
+
+from matlab_example.core import InputSignal, SearchSpace
+from matlab_example.evaluation import ThresholdObjective
+from matlab_example.executor import StreamingExecutor
+from matlab_example.matlab_engine import WorkerPool, create_worker_actors
+from matlab_example.spec import ModelSpec
+from matlab_example.work_queue import CheckpointedWorkQueue
+
+N_SIMULATIONS = 16
+CHECKPOINT = "parallel_simulation.checkpoint.jsonl"
 
-for trace in results:
-    print(trace.df)
+TIME_HORIZON = 30
 
+# The spec is put in the object store once; tasks only receive its reference.
+spec_ref = ray.put(
+    ModelSpec(
+        "Autotrans_shift",
+        model_parameters=[],
+        input_signals=[
+            InputSignal("throttle", lb=0, ub=100, n_control_point=5),
+            InputSignal("brake", lb=0, ub=100, n_control_point=5),
+        ],
+        output_variables=["speed", "rpm", "gear"],
+        time_horizon=TIME_HORIZON,
+        time_step=0.1,
+    )
+)
+objective = ThresholdObjective("speed", 120.0)
+space = SearchSpace(np.zeros(10), np.full(10, 100.0))  # throttle and brake, 5 control points each
+
+# Rerunning the script after an interruption resubmits only unfinished inputs.
+queue = CheckpointedWorkQueue(CHECKPOINT)
+queue.add((str(i), x.tolist()) for i, x in enumerate(space.latin_hypercube(N_SIMULATIONS)))
+
+# One actor per `matlab` resource of the cluster. Each actor runs one MATLAB
+# process pinned to its CPU slot and keeps it across simulations, so that
+# `spec.bind` reuses the loaded model, and exits it when the actor ends.
+n_workers = int(ray.cluster_resources().get("matlab", 1))
+pool = WorkerPool(
+    create_worker_actors(
+        n_workers,
+        setup_engine,
+        cpu_slots=cpu_slot_pool,
+        actor_options={"num_cpus": 2, "max_restarts": -1, "max_task_retries": 2},
+    )
+)
+executor = StreamingExecutor(
+    lambda item: pool.submit(simulate, spec_ref, item[1], objective, n_trace_points=100),
+    max_in_flight=n_workers,
+)
+# Results arrive as soon as each simulation finishes; stop at the first falsifying input.
+for (key, x), evaluation in executor.map_unordered(
+    queue.pending(),
+    stop=lambda item, evaluation: evaluation.fx < 0,
+):
+    queue.complete(key, evaluation.fx)
+    print(x, evaluation.fx)
+    if evaluation.trace is not None:
+        print(evaluation.trace.df)
@@ -0,0 +1,97 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from matlab_example.archive import TraceArchive, TraceArchiveWriter
+from matlab_example.core import RangeParameter, Valuation
+from matlab_example.simulator import Trace
+
+VARIABLES = ["speed", "rpm"]
+PARAMETERS = [RangeParameter("a", 0, 10), RangeParameter("b", 0, 10)]
+
+
+def make_item(i):
+    valuation = Valuation(PARAMETERS, [float(i), float(i % 3)])
+    time_steps = np.linspace(0, 1, 5 + i)
+    trace = Trace(time_steps, [time_steps * i, time_steps + i], VARIABLES)
+    return valuation, trace
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_round_trip(tmp_path, compress):
+    archive = TraceArchive(tmp_path, VARIABLES, chunk_size=3, compress=compress)
+    items = [make_item(i) for i in range(7)]
+    archive.extend(items)
+    # Two full chunks are written, the last trace is still buffered.
+    assert len(archive) == 6
+    archive.flush()
+    assert len(archive) == 7
+
+    reopened = TraceArchive(tmp_path)
+    assert reopened.variables == VARIABLES
+    for valuation, trace in items:
+        assert valuation in reopened
+        loaded = reopened.load(valuation)
+        assert np.array_equal(loaded.time_steps, trace.time_steps)
+        for var in VARIABLES:
+            assert np.array_equal(loaded[var], trace[var])
+        assert reopened.parameters(valuation) == {"a": valuation.values[0], "b": valuation.values[1]}
+
+    valuation, trace = items[4]
+    part = reopened.load(valuation.digest(), ["rpm"], time_window=(0.25, 0.75))
+    mask = (trace.time_steps >= 0.25) & (trace.time_steps <= 0.75)
+    assert part.variables == ["rpm"]
+    assert np.array_equal(part.time_steps, trace.time_steps[mask])
+    assert np.array_equal(part["rpm"], trace["rpm"][mask])
+    assert sorted(reopened.select(b=1.0)) == sorted(v.digest() for v, _ in items if v.values[1] == 1.0)
+    assert len(reopened.select(a=(2.0, 4.0))) == 3
+
+
+def test_validation(tmp_path):
+    with pytest.raises(ValueError):
+        TraceArchive(tmp_path / "missing")
+    archive = TraceArchive(tmp_path, VARIABLES)
+    with pytest.raises(ValueError):
+        TraceArchive(tmp_path, ["rpm", "speed"])
+    valuation, trace = make_item(1)
+    with pytest.raises(ValueError):
+        archive.append(valuation, Trace(trace.time_steps, [trace["rpm"]], ["rpm"]))
+    with pytest.raises(KeyError):
+        archive.load(valuation)
+
+
+def test_reader_refresh_sees_new_chunks(tmp_path):
+    writer = TraceArchiveWriter(tmp_path, VARIABLES, chunk_size=2)
+    reader = TraceArchive(tmp_path)
+    writer.extend([make_item(i) for i in range(3)])
+    assert len(reader) == 0
+    reader.refresh()
+    assert len(reader) == 2
+    assert writer.flush() == 3
+    reader.refresh()
+    assert len(reader) == 3
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_recovery_after_crash(tmp_path, compress):
+    archive = TraceArchive(tmp_path, VARIABLES, chunk_size=2, compress=compress)
+    archive.extend([make_item(i) for i in range(2)])
+
+    # A crash after writing the next chunk but before its index records,
+    # and another in the middle of an index record.
+    stale = make_item(10)
+    archive._write_chunk(1, {"__time__": stale[1].time_steps, "speed": stale[1]["speed"], "rpm": stale[1]["rpm"]})
+    with open(tmp_path / "index.jsonl", "a") as f:
+        f.write(json.dumps({"key": "partial"})[:-3])
+
+    reopened = TraceArchive(tmp_path, chunk_size=2)
+    assert len(reopened) == 2
+    items = [make_item(i) for i in range(2, 4)]
+    reopened.extend(items)
+    assert len(reopened) == 4
+    assert len(TraceArchive(tmp_path)) == 4
+    for valuation, trace in items:
+        assert np.array_equal(reopened.load(valuation)["speed"], trace["speed"])
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
@@ -0,0 +1,71 @@
+import sys
+import types
+
+import pytest
+
+from matlab_example.faults import SimulationError, is_transient_error, retry_transient
+
+
+@pytest.fixture
+def engine_module(monkeypatch):
+    # The exception types of `matlab.engine`, which is not installed here.
+    module = types.ModuleType("matlab.engine")
+    for name in ("MatlabExecutionError", "RejectedExecutionError", "EngineError"):
+        setattr(module, name, type(name, (Exception,), {}))
+    monkeypatch.setitem(sys.modules, "matlab.engine", module)
+    return module
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "MATLAB has terminated unexpectedly.",
+        "Failed to communicate with the MATLAB process.",
+        "License checkout failed. License Manager Error -4",
+        "Out of memory.",
+    ],
+)
+def test_engine_and_host_errors_are_transient(engine_module, message):
+    assert is_transient_error(engine_module.MatlabExecutionError(message))
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Invalid setting in 'model/Session Gain' for parameter 'Gain'.",
+        "Output port 1 of 'model/Subsystem' is not connected. Check the connection.",
+        "Error evaluating parameter 'StopTime': Undefined function 'horizon'.",
+    ],
+)
+def test_model_errors_are_not_transient(engine_module, message):
+    assert not is_transient_error(engine_module.MatlabExecutionError(message))
+
+
+def test_classification_by_type(engine_module):
+    assert is_transient_error(engine_module.EngineError("anything"))
+    assert is_transient_error(engine_module.RejectedExecutionError("anything"))
+    assert is_transient_error(ConnectionResetError())
+    assert not is_transient_error(ValueError("connection"))
+    assert is_transient_error(SimulationError("failed", transient=True))
+    assert not is_transient_error(SimulationError("failed"))
+
+
+def test_retry_transient_restarts_only_on_transient_errors():
+    restarts = []
+    outcomes = iter([SimulationError("died", transient=True), "trace"])
+
+    def fn():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert retry_transient(fn, restart=lambda: restarts.append(1), backoff=0) == "trace"
+    assert restarts == [1]
+
+    def fail():
+        raise SimulationError("bad input")
+
+    with pytest.raises(SimulationError):
+        retry_transient(fail, restart=lambda: restarts.append(1), backoff=0)
+    assert restarts == [1]
@@ -0,0 +1,63 @@
+import numpy as np
+
+from matlab_example.core import NeighborIndex, ObservationStore, SearchSpace
+from matlab_example.core.neighbors import novel_mask
+
+
+def _brute_knn(P, q, k):
+    dist = np.linalg.norm(P - q, axis=1)
+    order = np.argsort(dist, kind="stable")[:k]
+    return dist[order], order
+
+
+def test_knn_and_radius_match_brute_force_across_rebuilds():
+    rng = np.random.default_rng(0)
+    index = NeighborIndex(3, leaf_size=4)
+    points = np.zeros((0, 3))
+    # Small batches keep some points in the buffer and some in the tree.
+    for batch in range(12):
+        X = rng.uniform(size=(rng.integers(1, 30), 3))
+        index.add(X)
+        points = np.vstack([points, X])
+        assert len(index) == len(points)
+        assert np.array_equal(index.points, points)
+        for q in rng.uniform(size=(5, 3)):
+            dist, idx = index.query_knn(q, 7)
+            expected_dist, _ = _brute_knn(points, q, 7)
+            assert np.allclose(dist, expected_dist)
+            assert np.allclose(np.linalg.norm(points[idx] - q, axis=1), dist)
+
+            dist, idx = index.query_radius(q, 0.3)
+            inside = np.flatnonzero(np.linalg.norm(points - q, axis=1) <= 0.3)
+            assert sorted(idx.tolist()) == inside.tolist()
+            assert np.all(np.diff(dist) >= 0)
+
+
+def test_empty_index():
+    index = NeighborIndex(2)
+    dist, idx = index.query_knn(np.zeros(2), 3)
+    assert len(dist) == 0 and len(idx) == 0
+    assert not index.has_neighbor(np.zeros((1, 2)), 1.0).any()
+
+
+def test_novel_mask_drops_near_duplicates():
+    index = NeighborIndex(1)
+    index.add(np.array([[0.0]]))
+    X = np.array([[0.05], [0.5], [0.52], [0.9]])
+    assert novel_mask(X, 0.1, index).tolist() == [False, True, False, True]
+    assert novel_mask(X, 0.1).tolist() == [True, True, False, True]
+
+
+def test_observation_store_lookup_in_unit_cube():
+    space = SearchSpace(np.zeros(2), np.array([100.0, 1.0]))
+    store = ObservationStore(["a", "b"], space=space)
+    store.register(np.array([[50.0, 0.5], [10.0, 0.1]]), np.array([[1.0], [2.0]]))
+    # 0.5 apart in the first coordinate is 0.005 in the unit cube.
+    assert store.lookup(np.array([50.5, 0.5]), tol=0.01)[0] == 1.0
+    assert store.lookup(np.array([60.0, 0.5]), tol=0.01) is None
+    # Coarse observations are not reused.
+    store.register(np.array([[80.0, 0.8]]), np.array([[3.0]]), fidelity=1)
+    assert store.lookup(np.array([80.0, 0.8]), tol=0.01) is None
+    assert store.novel(np.array([[50.2, 0.5], [30.0, 0.3]]), tol=0.01).tolist() == [False, True]
+    dist, X, fX = store.nearest(np.array([12.0, 0.1]), k=1)
+    assert np.allclose(X, [[10.0, 0.1]]) and np.allclose(fX, [[2.0]])
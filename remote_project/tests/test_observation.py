@@ -0,0 +1,62 @@
+import numpy as np
+
+from matlab_example.core import ObservationStore
+
+
+def test_top_k_empty_store():
+    store = ObservationStore(["x0", "x1"])
+    for k in (1, 3, 100):
+        X, fX = store.top_k(k)
+        assert X.shape == (0, 2)
+        assert len(fX) == 0
+
+
+def test_top_k_without_full_fidelity_observations():
+    store = ObservationStore(["x0", "x1"], k_best=2)
+    store.register(np.ones((3, 2)), np.arange(3.0).reshape(3, 1), fidelity=1)
+    for k in (1, 3):
+        X, fX = store.top_k(k)
+        assert X.shape == (0, 2)
+        assert len(fX) == 0
+
+
+def test_top_k_matches_sorting():
+    rng = np.random.default_rng(0)
+    store = ObservationStore(["x0", "x1"], k_best=4)
+    X = rng.uniform(size=(50, 2))
+    fX = rng.uniform(size=(50, 1))
+    store.register(X[:20], fX[:20])
+    store.register(X[20:], fX[20:])
+    order = np.argsort(fX[:, 0], kind="stable")
+    for k in (3, 10):
+        top_X, top_fX = store.top_k(k)
+        assert np.allclose(top_X, X[order[:k]])
+        assert np.allclose(top_fX, fX[order[:k]])
+
+
+def _brute_front(F):
+    le = np.all(F[None, :, :] <= F[:, None, :], axis=2)
+    lt = np.any(F[None, :, :] < F[:, None, :], axis=2)
+    return set(np.flatnonzero(~np.any(le & lt, axis=1)).tolist())
+
+
+def test_pareto_front_matches_brute_force():
+    rng = np.random.default_rng(1)
+    for n_objectives in (1, 2, 3):
+        F = rng.integers(0, 5, size=(600, n_objectives)).astype(float)
+        store = ObservationStore(["x0"])
+        for part in np.array_split(np.arange(len(F)), 4):
+            store.register(np.zeros((len(part), 1)), F[part])
+        assert set(store._front.tolist()) == _brute_front(F)
+        _, front_fX = store.pareto_front()
+        assert len(front_fX) == len(_brute_front(F))
+
+
+def test_min_and_min_x_ignore_coarse_observations():
+    store = ObservationStore(["x0"])
+    assert store.min == np.inf
+    assert store.min_x is None
+    store.register(np.array([[1.0], [2.0]]), np.array([[3.0], [1.0]]))
+    store.register(np.array([[5.0]]), np.array([[-1.0]]), fidelity=1)
+    assert store.min == 1.0
+    assert np.allclose(store.min_x, [2.0])
@@ -0,0 +1,81 @@
+import sys
+import types
+
+from matlab_example.evaluation import Evaluation
+from matlab_example.scheduler import CostModelScheduler, RuntimeModel, SimulationJob
+
+
+def _jobs(n, time_horizon=30.0):
+    return [SimulationJob("Autotrans_shift", time_horizon, 0.1) for _ in range(n)]
+
+
+def test_batching_survives_observations_of_equal_size():
+    scheduler = CostModelScheduler()
+    jobs = _jobs(20)
+    before = [len(b) for b in scheduler.batches(jobs)]
+    assert before == [8, 8, 4]
+
+    scheduler.observe(jobs[0], 1.3)
+    assert scheduler.runtime_model.overhead == 1.0
+    assert [len(b) for b in scheduler.batches(jobs)] == before
+
+    for job in jobs[1:5]:
+        scheduler.observe(job, 1.3)
+    assert [len(b) for b in scheduler.batches(jobs)] == before
+
+
+def test_equal_size_fit_keeps_mean_runtime():
+    model = RuntimeModel(prior_overhead=1.0)
+    job = _jobs(1)[0]
+    model.observe(job, 0.5)
+    assert model.overhead == 0.5
+    assert abs(model.predict(job) - 0.5) < 1e-12
+    model.observe(job, 2.5)
+    assert model.overhead == 1.0
+    assert abs(model.predict(job) - 1.5) < 1e-12
+
+
+def test_overhead_is_fitted_from_different_sizes():
+    model = RuntimeModel(prior_overhead=1.0)
+    for horizon in (10.0, 20.0, 40.0):
+        job = _jobs(1, horizon)[0]
+        model.observe(job, 2.0 + 0.01 * job.n_steps)
+    assert abs(model.overhead - 2.0) < 1e-9
+
+
+class _Ref:
+    def __init__(self, value):
+        self.value = value
+
+
+def _fake_ray():
+    # Tasks complete immediately, in submission order.
+    ray = types.ModuleType("ray")
+    ray.wait = lambda refs, num_returns=1: (refs[:num_returns], refs[num_returns:])
+    ray.get = lambda ref: ref.value
+    ray.cancel = lambda ref: None
+    return ray
+
+
+def test_run_dispatches_longest_first_and_learns_runtimes(monkeypatch):
+    monkeypatch.setitem(sys.modules, "ray", _fake_ray())
+    scheduler = CostModelScheduler(min_batch_seconds=5.0)
+    long_jobs = [SimulationJob("Autotrans_shift", 3000.0, 0.1, payload=("long", i)) for i in range(2)]
+    short_jobs = [SimulationJob("Autotrans_shift", 10.0, 0.1, payload=("short", i)) for i in range(6)]
+    submitted = []
+
+    def submit(payloads):
+        submitted.append(payloads)
+        # 2 s of overhead plus 10 ms per step.
+        horizons = [3000.0 if kind == "long" else 10.0 for kind, _ in payloads]
+        return _Ref([Evaluation(None, 0.0, elapsed=2.0 + 0.01 * h / 0.1) for h in horizons])
+
+    results = list(scheduler.run(short_jobs + long_jobs, submit))
+    assert [p[0][0] for p in submitted[:2]] == ["long", "long"]
+    assert sorted(len(p) for p in submitted[2:]) == [1, 5]
+    assert sorted(job.payload for job, _ in results) == sorted(job.payload for job in short_jobs + long_jobs)
+
+    # The next round is scheduled with the learned runtimes.
+    assert abs(scheduler.runtime_model.overhead - 2.0) < 1e-9
+    assert abs(scheduler.runtime_model.predict(long_jobs[0]) - 302.0) < 1e-9
+    assert [len(b) for b in scheduler.batches(short_jobs)] == [2, 2, 2]
@@ -0,0 +1,69 @@
+import numpy as np
+
+from matlab_example.core import RangeParameter, Valuation
+from matlab_example.sensitivity import SensitivityAnalysis, saltelli_design, sobol_indices
+
+# Analytic indices of the Ishigami function with a=7 and b=0.1.
+ISHIGAMI_FIRST = np.array([0.3139, 0.4424, 0.0])
+ISHIGAMI_TOTAL = np.array([0.5576, 0.4424, 0.2437])
+
+
+def ishigami(X, a=7.0, b=0.1):
+    return np.sin(X[..., 0]) + a * np.sin(X[..., 1]) ** 2 + b * X[..., 2] ** 4 * np.sin(X[..., 0])
+
+
+def test_saltelli_design_columns():
+    A, B, AB = saltelli_design(64, 3, np.random.default_rng(0))
+    assert A.shape == B.shape == (64, 3)
+    assert AB.shape == (3, 64, 3)
+    for i in range(3):
+        others = [j for j in range(3) if j != i]
+        assert np.array_equal(AB[i][:, i], B[:, i])
+        assert np.array_equal(AB[i][:, others], A[:, others])
+
+
+def test_sobol_indices_on_ishigami():
+    n = 1 << 14
+    A, B, AB = saltelli_design(n, 3, np.random.default_rng(1))
+    fA, fB, fAB = (ishigami(-np.pi + 2 * np.pi * U) for U in (A, B, AB))
+    first, total = sobol_indices(fA, fB, fAB)
+    assert first.shape == total.shape == (3,)
+    assert np.allclose(first, ISHIGAMI_FIRST, atol=0.03)
+    assert np.allclose(total, ISHIGAMI_TOTAL, atol=0.03)
+
+
+class IshigamiModel:
+    """Stands in for a `SimulinkModel`: only its parameters are used."""
+
+    def __init__(self):
+        self.control_parameters = [RangeParameter(f"x{i}", -np.pi, np.pi) for i in range(3)] + [
+            RangeParameter("unused", 0, 1)
+        ]
+
+    def create_default_valuation(self):
+        return Valuation(self.control_parameters, [0.0, 0.0, 0.0, 0.5])
+
+
+def test_analysis_ranks_parameters_and_caches_points():
+    calls = []
+
+    def evaluate_batch(valuations):
+        calls.append(len(valuations))
+        assert all(v.values[3] == 0.5 for v in valuations)
+        return ishigami(np.array([v.values[:3] for v in valuations])).tolist()
+
+    analysis = SensitivityAnalysis(
+        IshigamiModel(), objective=None, parameters=["x0", "x1", "x2"], evaluate_batch=evaluate_batch, batch_size=500
+    )
+    result = analysis.run(1 << 11, n_bootstrap=100, seed=2)
+    assert result.n_evaluations == (1 << 11) * 5
+    assert max(calls) <= 500
+    assert result.ranking() == ["x0", "x1", "x2"]
+    assert np.all(result.total_order_ci[:, 0] <= result.total_order + 1e-12)
+    assert np.all(result.total_order <= result.total_order_ci[:, 1] + 1e-12)
+    assert np.allclose(result.total_order, ISHIGAMI_TOTAL, atol=0.1)
+
+    # The same design is served from the cache.
+    n_calls = len(calls)
+    analysis.run(1 << 11, n_bootstrap=10, seed=2)
+    assert len(calls) == n_calls
@@ -0,0 +1,85 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from matlab_example.core import InputSignal, RangeParameter, Valuation
+from matlab_example.sweep import Concat, Grid, RandomSubset, SweepCursor, Values
+
+A = RangeParameter("a", 0, 1)
+B = RangeParameter("b", 0, 10)
+C = RangeParameter("c", 5, 6)
+
+
+def test_grid_enumerates_in_mixed_radix_order():
+    grid = Grid(Values.linspace(A, 3), Values(B, [1, 2]), Values.linspace(C, 4))
+    assert len(grid) == 24
+    expected = list(itertools.product(np.linspace(0, 1, 3), [1, 2], np.linspace(5, 6, 4)))
+    assert np.allclose(grid.values(np.arange(24)), expected)
+    assert [p.name for p in grid.parameters] == ["a", "b", "c"]
+    with pytest.raises(ValueError):
+        Grid(Values(A, [0]), Values(A, [1]))
+
+
+def test_grid_over_signal_control_points():
+    signal = InputSignal("throttle", lb=0, ub=100, n_control_point=3)
+    grid = Grid.over(signal.control_parameters, 2)
+    assert len(grid) == 8
+    index, valuation = list(grid.valuations())[-1]
+    assert index == 7
+    assert valuation.values == [100.0, 100.0, 100.0]
+
+
+def test_concat_and_random_subset():
+    first = Grid.over([A, B], 3)
+    second = Grid(Values(A, [0.5]), Values(B, [5.0]))
+    concat = Concat(first, second)
+    assert len(concat) == 10
+    assert np.allclose(concat.values(np.arange(10)), np.vstack([first.values(np.arange(9)), [[0.5, 5.0]]]))
+    with pytest.raises(ValueError):
+        Concat(first, Grid.over([B, A], 2))
+
+    big = Grid.over([RangeParameter(f"p{i}", 0, 1) for i in range(12)], 10)
+    subset = RandomSubset(big, 100, seed=3)
+    assert len(subset) == 100
+    assert subset.digest == RandomSubset(big, 100, seed=3).digest
+    assert subset.digest != RandomSubset(big, 100, seed=4).digest
+    rows = subset.values(np.arange(100))
+    assert len({tuple(r) for r in rows}) == 100
+
+
+def test_valuations_patch_a_base():
+    grid = Grid.over([A], 3)
+    base = Valuation([A, B], [0.0, 7.0])
+    pairs = list(grid.valuations(1, 3, base=base, chunk_size=1))
+    assert [i for i, _ in pairs] == [1, 2]
+    assert [v.values for _, v in pairs] == [[0.5, 7.0], [1.0, 7.0]]
+
+
+def test_shards_are_computed_lazily():
+    grid = Grid.over([RangeParameter(f"q{i}", 0, 1) for i in range(20)], 5)
+    n_shards = grid.n_shards(256)
+    assert n_shards == -(-(5**20) // 256)
+    assert grid.shard(n_shards - 1, 256) == range(256 * (n_shards - 1), 5**20)
+    small = Grid.over([A], 10)
+    assert [small.shard(i, 4) for i in range(small.n_shards(4))] == [range(0, 4), range(4, 8), range(8, 10)]
+
+
+def test_cursor_resumes_and_rejects_other_sweeps(tmp_path):
+    sweep = Grid.over([A, B], 5)
+    path = tmp_path / "cursor.json"
+    cursor = SweepCursor(path, sweep, 4)
+    assert cursor.n_shards == 7
+    for shard in (0, 2, 1, 5):
+        cursor.complete(shard)
+    resumed = SweepCursor(path, sweep, 4)
+    assert resumed.n_done == 4
+    assert list(resumed.pending()) == [3, 4, 6]
+    assert resumed.is_done(5) and not resumed.is_done(3)
+    for shard in (3, 4, 6):
+        resumed.complete(shard)
+    assert SweepCursor(path, sweep, 4).finished
+    with pytest.raises(ValueError):
+        SweepCursor(path, sweep, 5)
+    with pytest.raises(ValueError):
+        SweepCursor(path, Grid.over([A, B], 6), 4)
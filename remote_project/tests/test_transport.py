@@ -0,0 +1,28 @@
+import os
+
+import numpy as np
+
+from matlab_example.transport import FileTransport
+
+
+def test_write_is_column_major(tmp_path):
+    transport = FileTransport(str(tmp_path))
+    array = np.arange(6.0).reshape(3, 2)
+    path = transport.write(array)
+    assert np.array_equal(np.fromfile(path), array.T.ravel())
+
+
+def test_read_copies_and_removes_the_file(tmp_path):
+    transport = FileTransport(str(tmp_path))
+    time_steps = np.linspace(0, 1, 4)
+    values = np.arange(12.0).reshape(3, 4)
+    path = transport.new_path("out")
+    # The layout written by `save_command`: size(sim_y), sim_t, then sim_y
+    # (n rows of k variables) in column-major order.
+    np.concatenate([[4, 3], time_steps, values.ravel()]).tofile(path)
+
+    read_time, read_values = transport.read(path)
+    assert not os.path.exists(path)
+    assert not isinstance(read_values.base, np.memmap)
+    assert np.array_equal(read_time, time_steps)
+    assert np.array_equal(read_values, values)
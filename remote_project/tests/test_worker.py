@@ -0,0 +1,94 @@
+import sys
+import types
+
+import pytest
+
+from matlab_example.matlab_engine import CpuSlotPool, MatlabWorker
+
+
+class FakeEngine:
+    def __init__(self):
+        self.exited = False
+
+    def feature(self, name):
+        return 4242
+
+    def maxNumCompThreads(self, n, nargout=0):
+        pass
+
+    def exit(self):
+        self.exited = True
+
+
+@pytest.fixture
+def engine_module(monkeypatch):
+    # Stands in for `matlab.engine`, which is not installed here.
+    module = types.ModuleType("matlab.engine")
+    module.EngineError = type("EngineError", (Exception,), {})
+    module.MatlabExecutionError = type("MatlabExecutionError", (Exception,), {})
+    module.RejectedExecutionError = type("RejectedExecutionError", (Exception,), {})
+    module.started = []
+
+    def start_matlab(options):
+        engine = FakeEngine()
+        module.started.append(engine)
+        return engine
+
+    module.start_matlab = start_matlab
+    package = types.ModuleType("matlab")
+    package.engine = module
+    monkeypatch.setitem(sys.modules, "matlab", package)
+    monkeypatch.setitem(sys.modules, "matlab.engine", module)
+    return module
+
+
+def test_engine_and_slot_live_and_die_together(tmp_path, engine_module):
+    pool = CpuSlotPool(tmp_path, [[0]])
+    setups = []
+    worker = MatlabWorker(setups.append, cpu_slots=lambda: pool)
+    assert pool.mapping() == {} and engine_module.started == []
+
+    first = worker.call(lambda engine, a: (engine, a), 1)[0]
+    assert worker.call(lambda engine: engine) is first
+    assert setups == [first]
+    assert pool.mapping()[0]["matlab"] == 4242
+
+    def crash(engine):
+        raise engine_module.EngineError("MATLAB has terminated")
+
+    with pytest.raises(engine_module.EngineError):
+        worker.call(crash)
+    assert first.exited
+    assert pool.mapping() == {}
+
+    second = worker.call(lambda engine: engine)
+    assert second is not first and worker.n_started == 2
+    worker.close()
+    assert second.exited
+    assert pool.mapping() == {}
+
+
+def test_deterministic_errors_keep_the_engine(tmp_path, engine_module):
+    worker = MatlabWorker()
+
+    def fail(engine):
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        worker.call(fail)
+    engine = worker.engine
+    assert not engine.exited and worker.n_started == 1
+    worker.close()
+
+
+def test_failed_start_releases_the_slot(tmp_path, engine_module):
+    pool = CpuSlotPool(tmp_path, [[0]])
+
+    def setup(engine):
+        raise RuntimeError("addpath failed")
+
+    worker = MatlabWorker(setup, cpu_slots=lambda: pool)
+    with pytest.raises(RuntimeError):
+        worker.call(lambda engine: None)
+    assert engine_module.started[0].exited
+    assert pool.mapping() == {}